@@ -5,8 +5,15 @@ from models.user import User
 from models.vehicle import Vehicle
 from models.damage import Damage
 from models.usage import UsageHistory
+from models.job import Job
+from models.fleet_summary import FleetSummary
 from controllers.auth import auth, bcrypt
 from controllers.main import main
+from services.job_runner import job_runner
+from ml.registry import registry
+from services.warmup import start_warm_up
+from services.export_cache import export_cache
+from services import db_profiles
 import os
 
 app = Flask(__name__)
@@ -18,8 +25,12 @@ def health_check():
 
 app.config.from_object(Config)
 
-db.init_app(app)
+# Engine options and SQLite pragmas for DB_PROFILE; also initialises db
+db_profiles.init_app(app, db)
 login_manager.init_app(app)
+registry.init_app(app)
+export_cache.init_app(app)
+job_runner.init_app(app)
 bcrypt.init_app(app)
 
 app.register_blueprint(auth, url_prefix='/auth')
@@ -66,6 +77,9 @@ def create_dummy_data():
 # This ensures tables exist even when not running via 'python app.py'
 with app.app_context():
     db.create_all()
+    # Add new columns and apply pending schema migrations (migrate_db.MIGRATIONS)
+    from migrate_db import migrate
+    migrate(db.engine)
     # Check if we need dummy data (only if user table is empty)
     # We wrap in try-except in case of migration issues, though create_all handles most.
     try:
@@ -77,5 +91,18 @@ with app.app_context():
     except Exception as e:
         print(f"Auto-setup warning: {e}")
 
+
+def start_background_services():
+    """Start the job threads and, per WARMUP in config.py, preload pandas and the model.
+
+    Called by the server entry points (``python app.py``, run_lan.py and
+    gunicorn.conf.py), not at import: the spawn workers of the model search
+    re-import the main module, and must not start job threads of their own.
+    """
+    job_runner.start()
+    start_warm_up(app)
+
+
 if __name__ == '__main__':
+    start_background_services()
     app.run(debug=True, port=5000)
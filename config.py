@@ -4,8 +4,44 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-smart-bmn-2024'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///smart_bmn.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'static', 'uploads')
+
+    # Engine tuning (services/db_profiles.py): 'sqlite' (WAL and pragmas), 'server' (pooled PostgreSQL/MySQL)
+    # or 'default' (plain SQLAlchemy settings); unset picks sqlite or server from DATABASE_URL
+    DB_PROFILE = os.environ.get('DB_PROFILE')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 15000)) # ms a writer waits for the write lock
+    SQLITE_CACHE_MB = int(os.environ.get('SQLITE_CACHE_MB', 64)) # Page cache per connection
+    SQLITE_MMAP_MB = int(os.environ.get('SQLITE_MMAP_MB', 256)) # Memory-mapped reads, 0 disables
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10)) # Server profile: connections kept open per process
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10)) # Extra connections under load, closed when returned
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800)) # Seconds before a pooled connection is replaced
+    DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 1000)) # Compiled SQL kept per engine
+    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'instance', 'uploads') # Import files waiting for their jobs; not served
     ML_MODEL_PATH = os.path.join(os.getcwd(), 'ml', 'saved_models')
+
+    # Background jobs (/analyze, /import, /retrain)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1)) # Threads per process, 0 disables the runner
+    JOB_POLL_INTERVAL = 2.0 # Seconds between queue checks
+    JOB_HEARTBEAT_TIMEOUT = 120 # Running jobs without a heartbeat this long are marked failed
+
+    # /import: rows validated and committed together; a chunk with invalid rows stops the import, earlier chunks stay
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 10000))
+
+    # Export files (/export, /export_damaged, auction list) cached per data version
+    EXPORT_CACHE_DIR = os.path.join(os.getcwd(), 'instance', 'export_cache')
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_MB', 512)) * 1024 * 1024
+    EXPORT_PREGENERATE = [f for f in os.environ.get('EXPORT_PREGENERATE', 'xlsx').split(',') if f] # Built in the background after /analyze; empty disables
+
+    # pandas and the ML stack load on first use; WARMUP preloads them at startup
+    WARMUP = os.environ.get('WARMUP', 'off') # off, background (after startup) or blocking
+    WARMUP_TRAINER = os.environ.get('WARMUP_TRAINER') == '1' # Also import scikit-learn/xgboost for /retrain
+
+    # /retrain: 'halving' searches the model families in parallel within the budget, 'grid' is the full GridSearchCV
+    TRAIN_SEARCH = os.environ.get('TRAIN_SEARCH', 'halving')
+    TRAIN_TIME_BUDGET = float(os.environ.get('TRAIN_TIME_BUDGET', 300)) # Seconds for the whole search
+
+    # Prediction cache (ml.registry): entries kept per process, 0 disables it
+    ML_PREDICTION_CACHE_SIZE = int(os.environ.get('ML_PREDICTION_CACHE_SIZE', 10000))
+    ML_MILEAGE_BUCKET = int(os.environ.get('ML_MILEAGE_BUCKET', 0)) # Round jarak_tempuh to N km for more cache hits; 0 = exact
     
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
@@ -1,53 +1,108 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify, current_app, abort
 from datetime import datetime
 from flask_login import login_required, current_user
+from sqlalchemy import select, update
 from models import db
 from models.vehicle import Vehicle
+from models.fleet_summary import dashboard_counts
 from models.maintenance import Maintenance
-from models.settings import Settings
-from services.excel_service import ExcelService
-from services.decision_engine import DecisionEngine
-from ml.trainer import MLTrainer
+from models.usage import last_usage
+from models.settings import Settings, settings_cache
+from services.job_runner import job_runner
+from services.export_cache import export_cache
+from models.job import Job
+from ml.registry import registry
+import services.tasks  # registers the background job tasks
+# pandas, NumPy and the ML stack are imported inside the routes that need them,
+# so the web process starts without them (see startup_bench.py)
 import json
 import os
+import uuid
 
 main = Blueprint('main', __name__)
 
+
+def send_export(build, name):
+    """Build the export in the ?format= of the request (xlsx, csv, parquet) and stream it as ``name.<format>``."""
+    from services.excel_service import EXPORT_FORMATS
+    fmt = request.args.get('format', 'xlsx')
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    try:
+        output = build(fmt)
+    except ImportError as e:
+        flash(str(e), 'danger')
+        return redirect(request.referrer or url_for('main.vehicles'))
+    # send_file streams the temp file in blocks and closes (deletes) it afterwards
+    return send_file(output, download_name=f'{name}.{fmt}', as_attachment=True, mimetype=EXPORT_FORMATS[fmt])
+
+
+def render_vehicle_list(template, rows_template, fixed=None, default_sort='plat', rows=None):
+    """One page of a filtered, sorted VehicleList (see services/vehicle_list.py).
+
+    Renders ``template`` with the first page, or with ?format=json returns
+    the page after ?after= as JSON: the vehicles in ``items``, the same rows
+    rendered by ``rows_template`` in ``html`` for the page to append, and the
+    URL of the next page in ``next``. ``rows(vehicles)`` can wrap the
+    vehicles before they are rendered.
+    """
+    from services.vehicle_list import KONDISI, PAGE_SIZE, REKOMENDASI, SORT_OPTIONS, VehicleList
+    listing = VehicleList(request.args, fixed, default_sort)
+    try:
+        vehicles, cursor = listing.page(request.args.get('after'), request.args.get('size', PAGE_SIZE, type=int))
+    except ValueError:
+        abort(400)
+    page_rows = rows(vehicles) if rows else vehicles
+    next_url = url_for(request.endpoint, **listing.query_args(after=cursor, format='json')) if cursor else None
+    as_json = request.args.get('format') == 'json'
+    # Pages appended to a list already shown need no count
+    count, exact = (None, None) if as_json and request.args.get('after') else listing.count_estimate()
+
+    if as_json:
+        return jsonify({'items': [v.to_dict() for v in vehicles], 'html': render_template(rows_template, rows=page_rows),
+                        'next': next_url, 'count': count, 'exact': exact})
+    return render_template(template, rows=page_rows, rows_template=rows_template, listing=listing,
+                           next_url=next_url, count=count, exact=exact, sort_options=SORT_OPTIONS,
+                           kondisi_choices=(fixed or {}).get('kondisi', KONDISI),
+                           rekomendasi_choices=(fixed or {}).get('rekomendasi', REKOMENDASI))
+
+
+def send_cached_export(name, download_name):
+    """Like send_export for the fleet exports, served from export_cache.
+
+    The data version and format are the ETag and the file time the
+    Last-Modified, so a repeated download of unchanged data is answered
+    with 304.
+    """
+    from services.excel_service import EXPORT_FORMATS
+    fmt = request.args.get('format', 'xlsx')
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    try:
+        path, version = export_cache.get(name, fmt)
+    except ImportError as e:
+        flash(str(e), 'danger')
+        return redirect(request.referrer or url_for('main.vehicles'))
+    return send_file(path, download_name=f'{download_name}.{fmt}', as_attachment=True,
+                     mimetype=EXPORT_FORMATS[fmt], etag=f'{name}-{version}-{fmt}', conditional=True, max_age=0)
+
+
 @main.route('/')
 @login_required
 def dashboard():
-    total_vehicles = Vehicle.query.count()
-    layak_vehicles = Vehicle.query.filter_by(rekomendasi_lelang='Layak Lelang').count()
-    
-    # Count damaged vehicles
-    damaged_vehicles = Vehicle.query.filter(
-        (Vehicle.kondisi_saat_ini == 'Rusak Ringan') | 
-        (Vehicle.kondisi_saat_ini == 'Rusak Berat')
-    ).count()
-    
+    # Counts come from the maintained fleet_summary rows, not from scanning the fleet
+    total_vehicles, layak_vehicles, per_kondisi = dashboard_counts()
+    damaged_vehicles = per_kondisi['Rusak Ringan'] + per_kondisi['Rusak Berat']
+
     # Condition distribution for bar chart
-    baik_count = Vehicle.query.filter_by(kondisi_saat_ini='Baik').count()
-    rusak_ringan_count = Vehicle.query.filter_by(kondisi_saat_ini='Rusak Ringan').count()
-    rusak_berat_count = Vehicle.query.filter_by(kondisi_saat_ini='Rusak Berat').count()
-    condition_data = [baik_count, rusak_ringan_count, rusak_berat_count]
+    condition_data = [per_kondisi['Baik'], per_kondisi['Rusak Ringan'], per_kondisi['Rusak Berat']]
     
     # Chart Data
     # 1. Status Ratio
     status_data = [layak_vehicles, total_vehicles - layak_vehicles]
     
-    # 2. ML Performance
-    try:
-        with open('ml/saved_models/best_model.json', 'r') as f:
-            content = json.load(f)
-            ml_metrics = content.get('metrics', {})
-            # Sanitize NaN
-            import math
-            for m in ml_metrics:
-                for k in ml_metrics[m]:
-                    if isinstance(ml_metrics[m][k], float) and math.isnan(ml_metrics[m][k]):
-                        ml_metrics[m][k] = 0.0
-    except:
-        ml_metrics = None
+    # 2. ML Performance, re-read only when the model is retrained
+    ml_metrics = registry.metrics()
 
     vehicles = Vehicle.query.order_by(Vehicle.created_at.desc()).limit(5).all()
     
@@ -127,6 +182,7 @@ def vehicles():
             db.session.commit()
             
             # Trigger single analysis
+            from services.decision_engine import DecisionEngine
             de = DecisionEngine()
             de.analyze_vehicle(v)
             db.session.commit()
@@ -141,55 +197,18 @@ def vehicles():
         
         return redirect(url_for('main.vehicles'))
         
-    all_vehicles = Vehicle.query.all()
-    return render_template('vehicles.html', vehicles=all_vehicles)
+    return render_vehicle_list('vehicles.html', 'vehicle_rows.html')
 
 @main.route('/damaged_vehicles')
 @login_required
 def damaged_vehicles():
-    vehicles = Vehicle.query.filter(
-        (Vehicle.kondisi_saat_ini == 'Rusak Ringan') | 
-        (Vehicle.kondisi_saat_ini == 'Rusak Berat')
-    ).all()
-    return render_template('damaged_vehicles.html', vehicles=vehicles)
+    return render_vehicle_list('damaged_vehicles.html', 'damaged_vehicle_rows.html',
+                               fixed={'kondisi': ['Rusak Ringan', 'Rusak Berat']})
 
 @main.route('/export_damaged')
 @login_required
 def export_damaged():
-    import pandas as pd
-    import io
-    
-    vehicles = Vehicle.query.filter(
-        (Vehicle.kondisi_saat_ini == 'Rusak Ringan') |
-        (Vehicle.kondisi_saat_ini == 'Rusak Berat')
-    ).all()
-    
-    data = []
-    for v in vehicles:
-        data.append({
-            'Plat Nomor': v.plat_no,
-            'Jenis': v.jenis,
-            'Merk': v.merk,
-            'Tipe': v.tipe,
-            'Tahun': v.tahun_perolehan,
-            'Kondisi': v.kondisi_saat_ini,
-            'Jarak Tempuh': v.jarak_tempuh,
-            'Harga Perolehan': v.harga_perolehan,
-            'Prediksi Nilai Jual': v.prediksi_nilai_jual,
-            'Rekomendasi': v.rekomendasi_lelang,
-            'Skor': v.skor_kelayakan
-        })
-    
-    df = pd.DataFrame(data)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Kendaraan Rusak')
-    
-    output.seek(0)
-    return send_file(output, 
-                     download_name=f'kendaraan_rusak_{datetime.now().strftime("%Y%m%d")}.xlsx',
-                     as_attachment=True,
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return send_cached_export('damaged', f'kendaraan_rusak_{datetime.now().strftime("%Y%m%d")}')
 
 @main.route('/maintenance/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -300,41 +319,121 @@ def upload_excel():
         flash('No selected file', 'danger')
         return redirect(url_for('main.vehicles'))
         
-    svc = ExcelService()
-    success, msg = svc.import_vehicles(file)
-    if success:
-        # Trigger Analysis for all vehicles (especially new ones)
-        from services.decision_engine import DecisionEngine
-        de = DecisionEngine()
-        vehicles = Vehicle.query.all()
-        for v in vehicles:
-            de.analyze_vehicle(v)
-        db.session.commit()
-        
-        flash(f"{msg}. Analisis kendaraan berhasil diperbarui.", 'success')
-    else:
-        flash(msg, 'danger')
+    from services.excel_service import IMPORT_FORMATS, UNSUPPORTED_IMPORT
+    if not file.filename.lower().endswith(IMPORT_FORMATS):
+        flash(UNSUPPORTED_IMPORT, 'danger')
+        return redirect(url_for('main.vehicles'))
+
+    # Keep the upload on disk for the background jobs; previews never confirmed are dropped after a day
+    remove_stale_uploads(current_app.config['UPLOAD_FOLDER'], 'import_', 24 * 3600)
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"import_{uuid.uuid4().hex}{os.path.splitext(file.filename)[1]}")
+    file.save(path)
+    # First a dry run: the preview page shows what would change before anything is written
+    job = job_runner.enqueue('import', {'path': path, 'filename': file.filename, 'dry_run': True},
+                             created_by=current_user.username)
+    flash('File sedang diperiksa. Ringkasan perubahan akan ditampilkan sebelum data disimpan.', 'info')
+    return redirect(url_for('main.vehicles', job=job.id))
+
+def remove_stale_uploads(folder, prefix, max_age):
+    cutoff = datetime.now().timestamp() - max_age
+    for entry in os.scandir(folder):
+        if entry.name.startswith(prefix) and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+def import_preview_job(id):
+    """The finished dry-run import job ``id`` and its upload path, or (job, None) if it cannot be imported.
+
+    A preview can be imported or discarded once; after an import its file belongs to the import job.
+    """
+    job = db.session.get(Job, id) or abort(404)
+    params = json.loads(job.params or '{}')
+    if job.kind != 'import' or not params.get('dry_run'):
+        abort(404)
+    path = params['path']
+    available = (job.status == 'done' and not params.get('committed') and not params.get('discarded')
+                 and os.path.exists(path))
+    return job, (path if available else None)
+
+def claim_preview(job, flag):
+    """Set ``flag`` ('committed' or 'discarded') in the preview job's params, uncommitted.
+
+    The conditional UPDATE only matches the params as they were read, so of
+    two concurrent confirms or discards (a double submit) only one gets
+    True; the other's transaction is rolled back.
+    """
+    params = json.loads(job.params)
+    claimed = db.session.execute(
+        update(Job).where(Job.id == job.id, Job.params == job.params)
+        .values(params=json.dumps(dict(params, **{flag: True}))))
+    if claimed.rowcount != 1:
+        db.session.rollback()
+        return False
+    return True
+
+@main.route('/import/<int:id>/preview')
+@login_required
+def import_preview(id):
+    job, path = import_preview_job(id)
+    if job.status in ('queued', 'running'):
+        return redirect(url_for('main.vehicles', job=job.id))
+    if job.status != 'done':
+        flash(f'Pemeriksaan file gagal: {job.error or job.status}', 'danger')
+        return redirect(url_for('main.vehicles'))
+    result = json.loads(job.result)
+    return render_template('import_preview.html', job=job, result=result, preview=result['preview'],
+                           available=path is not None)
+
+@main.route('/import/<int:id>/commit', methods=['POST'])
+@login_required
+def import_commit(id):
+    job, path = import_preview_job(id)
+    preview = json.loads(job.result)['preview'] if path else None
+    if preview is None:
+        flash('File import sudah diproses atau tidak tersedia lagi. Silakan upload ulang.', 'warning')
+        return redirect(url_for('main.vehicles'))
+    if preview['error_count']:
+        flash('File masih berisi baris tidak valid. Perbaiki lalu upload ulang.', 'danger')
+        return redirect(url_for('main.import_preview', id=id))
+
+    # Mark the preview committed in the same transaction as the enqueue
+    if not claim_preview(job, 'committed'):
+        flash('File import sudah diproses atau tidak tersedia lagi. Silakan upload ulang.', 'warning')
+        return redirect(url_for('main.vehicles'))
+    params = json.loads(job.params)
+    new_job = job_runner.enqueue('import', {'path': path, 'filename': params['filename']},
+                                 created_by=current_user.username)
+    flash('Import dijadwalkan dan berjalan di latar belakang.', 'info')
+    return redirect(url_for('main.vehicles', job=new_job.id))
+
+@main.route('/import/<int:id>/discard', methods=['POST'])
+@login_required
+def import_discard(id):
+    job, path = import_preview_job(id)
+    if not path or not claim_preview(job, 'discarded'):
+        # Already confirmed (the import job has the file) or discarded
+        flash('File import sudah diproses atau tidak tersedia lagi.', 'warning')
+        return redirect(url_for('main.vehicles'))
+    db.session.commit()
+    os.remove(path)
+    flash('Import dibatalkan, tidak ada data yang diubah.', 'info')
     return redirect(url_for('main.vehicles'))
 
 @main.route('/export')
 @login_required
 def export_excel():
-    svc = ExcelService()
-    output = svc.export_analysis()
-    return send_file(output, download_name='analisis_bmn.xlsx', as_attachment=True)
+    return send_cached_export('analysis', 'analisis_bmn')
 
 @main.route('/analyze')
 @login_required
 def analyze_all():
-    vehicles = Vehicle.query.all()
-    de = DecisionEngine()
-    count = 0
-    for v in vehicles:
-        de.analyze_vehicle(v)
-        count += 1
-    db.session.commit()
-    flash(f'{count} kendaraan dianalisis ulang.', 'success')
-    return redirect(url_for('main.dashboard'))
+    # Only vehicles whose inputs, rules or model changed, unless ?full=1
+    full = request.args.get('full') == '1'
+    job = job_runner.enqueue('analyze', {'full': full}, created_by=current_user.username)
+    flash('Analisis dijadwalkan dan berjalan di latar belakang.', 'info')
+    return redirect(url_for('main.dashboard', job=job.id))
 
 @main.route('/settings', methods=['GET', 'POST'])
 @login_required
@@ -352,6 +451,8 @@ def settings():
         s.max_biaya_perawatan_pct = float(request.form['max_biaya'])
         s.wajib_lelang_kondisi = request.form['kondisi_rusak']
         db.session.commit()
+        # Other workers notice the bumped version on their next read
+        settings_cache.invalidate()
         flash('Pengaturan disimpan', 'success')
         
     return render_template('settings.html', settings=s)
@@ -359,73 +460,49 @@ def settings():
 @main.route('/retrain')
 @login_required
 def retrain():
-    # Fetch data from DB
-    import pandas as pd
-    vehicles = Vehicle.query.all()
-    if not vehicles:
+    if not Vehicle.query.first():
         flash('Tidak ada data untuk training', 'warning')
         return redirect(url_for('main.dashboard'))
-    
-    data = [v.to_dict() for v in vehicles]
-    df = pd.DataFrame(data)
-    # Map for training
-    # Ideally we need historical sales data ("Real Value"), but for now we simulate target
-    # In real app, user would upload 'Sales History' separately
-    # Here we mock the target based on depreciation formula for demonstration
-    current_year = 2024
-    df['nilai_pasar_real'] = df['harga_awal'] * (0.85 ** (current_year - df['tahun']))
-    df['kondisi_saat_ini'] = df['kondisi']
-    df['harga_perolehan'] = df['harga_awal']
-    df['tahun_perolehan'] = df['tahun']
-    df['jarak_tempuh'] = 10000 # Mock if missing
-    
-    trainer = MLTrainer()
-    results = trainer.train_all(df=df)
-    
-    flash(f'Training Selesai! Best Model updated.', 'success')
-    return redirect(url_for('main.dashboard'))
+
+    job = job_runner.enqueue('retrain', created_by=current_user.username)
+    flash('Training dijadwalkan dan berjalan di latar belakang.', 'info')
+    return redirect(url_for('main.dashboard', job=job.id))
+
+@main.route('/ml/stats')
+@login_required
+def ml_stats():
+    # Model loads and prediction cache hit/miss/eviction counts for this process
+    return jsonify(registry.stats())
+
+@main.route('/jobs/<int:id>')
+@login_required
+def job_status(id):
+    job = db.session.get(Job, id) or abort(404)
+    return jsonify(job.to_dict())
+
+@main.route('/jobs/<int:id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(id):
+    job = db.session.get(Job, id) or abort(404)
+    job_runner.cancel(job)
+    return jsonify(job.to_dict())
 
 @main.route('/auction-recommendations')
 @login_required
 def auction_list():
-    vehicles = Vehicle.query.filter_by(rekomendasi_lelang='Layak Lelang').all()
-    # Add context (last user)
-    results = []
-    for v in vehicles:
-        last_usage = sorted(v.usage_history, key=lambda x: x.tanggal_mulai, reverse=True)
-        current_user_info = last_usage[0] if last_usage else None
-        
-        results.append({
-            'vehicle': v,
-            'current_user': current_user_info
-        })
-        
-    return render_template('auction_list.html', results=results)
+    # Add context (last user), one query for the whole page
+    def with_last_user(vehicles):
+        latest = last_usage(Vehicle.id.in_([v.id for v in vehicles]))
+        users = {u.vehicle_id: u for u in db.session.execute(select(latest))}
+        return [{'vehicle': v, 'current_user': users.get(v.id)} for v in vehicles]
+
+    return render_vehicle_list('auction_list.html', 'auction_rows.html', fixed={'rekomendasi': ['Layak Lelang']},
+                               default_sort='-skor', rows=with_last_user)
 
 @main.route('/auction-recommendations/export')
 @login_required
 def export_auction_list():
-    vehicles = Vehicle.query.filter_by(rekomendasi_lelang='Layak Lelang').all()
-    data = []
-    for v in vehicles:
-        last_usage = sorted(v.usage_history, key=lambda x: x.tanggal_mulai, reverse=True)
-        u = last_usage[0] if last_usage else None
-        
-        data.append({
-            'Plat No': v.plat_no,
-            'Jenis': v.jenis,
-            'Merk/Tipe': f"{v.merk} {v.tipe}",
-            'Tahun': v.tahun_perolehan,
-            'Kondisi': v.kondisi_saat_ini,
-            'Rekomendasi': v.rekomendasi_lelang,
-            'Alasan': v.alasan_rekomendasi,
-            'Driver Terakhir': u.driver_name if u else '-',
-            'Pejabat Terakhir': u.pejabat_name if u else '-'
-        })
-        
-    svc = ExcelService()
-    output = svc.export_auction_list(data)
-    return send_file(output, download_name='rekomendasi_lelang.xlsx', as_attachment=True)
+    return send_cached_export('auction', 'rekomendasi_lelang')
 
 @main.route('/vehicle/<int:id>/history')
 @login_required
@@ -489,6 +566,6 @@ def export_vehicle_history(id):
         
     data.sort(key=lambda x: x['Tanggal'], reverse=True)
     
+    from services.excel_service import ExcelService
     svc = ExcelService()
-    output = svc.export_vehicle_history(data)
-    return send_file(output, download_name=f'riwayat_{v.plat_no}.xlsx', as_attachment=True)
+    return send_export(lambda fmt: svc.export_vehicle_history(data, fmt), f'riwayat_{v.plat_no}')
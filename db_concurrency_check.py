@@ -0,0 +1,171 @@
+"""Concurrency check for the database engine profiles.
+
+For each profile, fills a throw-away SQLite database with ``--vehicles``
+vehicles, then runs a full re-analysis (the 'analyze' job with full=True)
+in one process while ``--readers`` other processes, standing in for the
+other gunicorn workers, keep running the dashboard and damaged-list
+queries. Reports how long the analysis took and the read latencies:
+
+    python db_concurrency_check.py
+    python db_concurrency_check.py --vehicles 50000 --chunk-size 50000
+
+Exits with status 1 if the analysis fails, a reader fails under a tuned
+profile (e.g. "database is locked"), or the slowest read under the sqlite
+profile takes longer than ``--max-read`` seconds, so it can guard against
+regressions. The 'default' profile is plain SQLAlchemy with SQLite's
+rollback journal, for comparison.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SEED = r"""
+import sys
+from datetime import datetime
+from sqlalchemy import insert
+from app import app
+from models import db
+from models.vehicle import Vehicle
+from services.job_runner import job_runner
+
+vehicles, chunk_size = int(sys.argv[1]), int(sys.argv[2])
+kondisi = ['Baik', 'Rusak Ringan', 'Rusak Berat']
+with app.app_context():
+    db.session.execute(insert(Vehicle), [
+        {'plat_no': f'B {i:06d} XX', 'jenis': 'Mobil' if i % 3 else 'Motor', 'merk': 'Toyota', 'tipe': f'Tipe {i % 40}',
+         'tahun_perolehan': 2005 + i % 19, 'harga_perolehan': 50000000.0 + 1000 * (i % 5000),
+         'kondisi_saat_ini': kondisi[i % 3], 'jarak_tempuh': (i * 37) % 250000, 'created_at': datetime.now()}
+        for i in range(vehicles)])
+    db.session.commit()
+    print(job_runner.enqueue('analyze', {'full': True, 'chunk_size': chunk_size}).id)
+"""
+
+READER = r"""
+import json, os, sys, time
+from sqlalchemy import func, select
+from app import app
+from models import db
+from models.vehicle import Vehicle
+
+stop = sys.argv[1]
+latencies, errors = [], []
+with app.app_context():
+    print('ready', flush=True)
+    while not os.path.exists(stop):
+        start = time.perf_counter()
+        try:
+            db.session.execute(select(func.count()).select_from(Vehicle)
+                               .where(Vehicle.rekomendasi_lelang == 'Layak Lelang')).scalar()
+            db.session.execute(select(Vehicle).where(Vehicle.kondisi_saat_ini == 'Rusak Berat').limit(50)).all()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            errors.append(str(e).splitlines()[0])
+        latencies.append(time.perf_counter() - start)
+print(json.dumps({'latencies': latencies, 'errors': errors}))
+"""
+
+WRITER = r"""
+import json, sys, time
+from app import app
+from models import db
+from models.job import Job
+from services.job_runner import job_runner
+
+start = time.perf_counter()
+job_runner._run(int(sys.argv[1]))
+analysis = time.perf_counter() - start
+with app.app_context():
+    print(json.dumps({'analysis': analysis, 'status': db.session.get(Job, int(sys.argv[1])).status,
+                      'journal_mode': db.session.execute(db.text('PRAGMA journal_mode')).scalar()}))
+"""
+
+
+def child_env(profile, tmp):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, f'{profile}.db')}"
+    env['DB_PROFILE'] = profile
+    env['JOB_WORKERS'] = '0'  # the writer runs the job itself
+    env['WARMUP'] = 'off'
+    env['EXPORT_PREGENERATE'] = ''
+    env['PYTHONWARNINGS'] = 'ignore'
+    return env
+
+
+def last_json(output):
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_profile(profile, args, tmp):
+    env = child_env(profile, tmp)
+    seed = subprocess.run([sys.executable, '-c', SEED, str(args.vehicles), str(args.chunk_size)],
+                          env=env, capture_output=True, text=True, check=True)
+    job_id = seed.stdout.strip().splitlines()[-1]
+
+    stop = os.path.join(tmp, f'{profile}.stop')
+    readers = [subprocess.Popen([sys.executable, '-c', READER, stop], env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+               for _ in range(args.readers)]
+    for reader in readers:
+        reader.stdout.readline()  # 'ready'
+    time.sleep(0.5)
+
+    try:
+        writer = subprocess.run([sys.executable, '-c', WRITER, job_id],
+                                env=env, capture_output=True, text=True, check=True)
+    finally:
+        open(stop, 'w').close()
+    result = last_json(writer.stdout)
+
+    result['latencies'], result['errors'] = [], []
+    for reader in readers:
+        out = last_json(reader.communicate()[0])
+        result['latencies'] += out['latencies']
+        result['errors'] += out['errors']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehicles', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=5000, help="vehicles per commit of the analyze job")
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--profiles', nargs='+', default=['default', 'sqlite'])
+    parser.add_argument('--max-read', type=float, default=0.5, help='seconds, slowest read under the sqlite profile')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"Full analysis of {args.vehicles} vehicles, {args.chunk_size} per commit, "
+          f"with {args.readers} reader processes")
+    print(f"{'profile':<8} {'journal':<8} {'analysis':>9} {'reads':>7} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'errors':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            r = run_profile(profile, args, tmp)
+            lat = sorted(r['latencies']) or [0.0]
+            p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+            print(f"{profile:<8} {r['journal_mode']:<8} {r['analysis']:>8.2f}s {len(lat):>7} "
+                  f"{statistics.median(lat) * 1000:>8.1f} {p99 * 1000:>8.1f} {lat[-1] * 1000:>8.1f} "
+                  f"{len(r['errors']):>6}")
+
+            if r['status'] != 'done':
+                failures.append(f"{profile}: analysis job {r['status']}")
+            if r['errors'] and profile != 'default':
+                failures.append(f"{profile}: {len(r['errors'])} failed reads, e.g. {r['errors'][0]}")
+            if profile == 'sqlite' and lat[-1] > args.max_read:
+                failures.append(f"sqlite: slowest read {lat[-1]:.2f}s, budget {args.max_read:.2f}s")
+
+    for f in failures:
+        print(f"FAIL: {f}")
+    if not failures:
+        print("OK: readers were not blocked by the analysis")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Drift check for the dashboard counts in fleet_summary.
+
+Seeds a throw-away SQLite database with vehicles and runs a full 'analyze'
+job. Then it changes the fleet through each path that maintains the counts:
+an import of new and updated plates, ORM inserts, updates and deletes, and
+a new damage report. After that it runs an incremental 'analyze' job, the
+one /analyze queues, which does not recount the summary.
+
+After each job ``dashboard_counts()`` must equal the counts
+``counts_select()`` reads from the vehicle table. Exits with status 1 if
+they differ, so a bug in the incremental maintenance shows up here instead
+of being hidden by a recount:
+
+    python fleet_summary_check.py
+"""
+import csv
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import date
+
+VEHICLES = 500
+
+
+def seed():
+    from sqlalchemy import insert
+
+    from models import db
+    from models.fleet_summary import rebuild
+    from models.vehicle import Vehicle
+
+    kondisi = ['Baik', 'Rusak Ringan', 'Rusak Berat']
+    db.session.execute(insert(Vehicle), [
+        {'plat_no': f'F {i:04d} SC', 'jenis': 'Mobil' if i % 3 else 'Motor', 'merk': 'Toyota', 'tipe': '-',
+         'tahun_perolehan': 2000 + i % 24, 'harga_perolehan': 1e8 + 1e6 * i, 'kondisi_saat_ini': kondisi[i % 3],
+         'jarak_tempuh': 1000 * i}
+        for i in range(VEHICLES)])
+    # Bulk inserts bypass the mapper events, as in a fresh database before migration 2
+    rebuild(db.session.connection())
+    db.session.commit()
+
+
+def write_import(path):
+    # Updates the condition of existing plates and adds new ones
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Plat Nomor', 'Jenis', 'Merk', 'Tipe', 'Tahun', 'Harga', 'Kondisi', 'KM'])
+        for i in range(0, 60, 3):
+            writer.writerow([f'F {i:04d} SC', 'Motor', 'Toyota', '-', 2000 + i % 24, 1e8 + 1e6 * i, 'Rusak Berat', 1000 * i])
+        for i in range(20):
+            writer.writerow([f'N {i:04d} SC', 'Mobil', 'Honda', '-', 2010 + i, 2e8, ['Baik', 'Rusak Ringan'][i % 2], 5000])
+
+
+def change_fleet(tmp):
+    from models import db
+    from models.damage import Damage
+    from models.vehicle import Vehicle
+    from services.excel_service import ExcelService
+
+    path = os.path.join(tmp, 'import.csv')
+    write_import(path)
+    ok, msg = ExcelService().import_file(path, chunk_size=16)
+    if not ok:
+        raise RuntimeError(msg)
+
+    vehicles = Vehicle.query.order_by(Vehicle.id).limit(40).all()
+    for v in vehicles[:10]:
+        v.kondisi_saat_ini = 'Baik' if v.kondisi_saat_ini != 'Baik' else 'Rusak Ringan'
+    for v in vehicles[10:15]:
+        db.session.delete(v)
+    for v in vehicles[15:25]:
+        db.session.add(Damage(vehicle_id=v.id, deskripsi='-', tingkat_kerusakan='Berat', biaya_perbaikan=9e7,
+                              status='Belum Diperbaiki', tanggal=date.today()))
+    db.session.add(Vehicle(plat_no='O 0001 SC', jenis='Mobil', merk='Isuzu', tipe='-', tahun_perolehan=2008,
+                           harga_perolehan=3e8, kondisi_saat_ini='Rusak Berat', jarak_tempuh=150000))
+    db.session.commit()
+
+
+def counts_from_vehicles():
+    """(total, layak, count per condition) as dashboard_counts, from counts_select over the vehicles."""
+    from models import db
+    from models.fleet_summary import counts_select
+
+    total, layak, per_kondisi = 0, 0, Counter()
+    for kondisi, is_layak, n in db.session.execute(counts_select()):
+        total += n
+        layak += n if is_layak else 0
+        per_kondisi[kondisi] += n
+    return total, layak, per_kondisi
+
+
+def run_job(full):
+    from models import db
+    from models.job import Job
+    from services.job_runner import job_runner
+
+    job = job_runner.enqueue('analyze', {'full': full})
+    job_runner._run(job.id)
+    db.session.expire_all()
+    job = db.session.get(Job, job.id)
+    if job.status != 'done':
+        raise RuntimeError(f"analyze job {job.status}: {job.error}")
+    return job
+
+
+def compare(name, failures):
+    from models.fleet_summary import dashboard_counts
+
+    summary, stored = dashboard_counts(), counts_from_vehicles()
+    print(f"{name}: summary {summary[0]} vehicles, {summary[1]} layak, {dict(+summary[2])}; "
+          f"vehicles {stored[0]}, {stored[1]} layak, {dict(+stored[2])}")
+    if (summary[0], summary[1], +summary[2]) != (stored[0], stored[1], +stored[2]):
+        failures.append(f"after {name} the dashboard counts differ from the vehicle table")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'summary.db')}"
+        os.environ['JOB_WORKERS'] = '0'
+        os.environ['WARMUP'] = 'off'
+        os.environ['EXPORT_PREGENERATE'] = ''
+
+        from app import app
+
+        failures = []
+        with app.app_context():
+            seed()
+            run_job(full=True)
+            compare('the full analysis', failures)
+
+            change_fleet(tmp)
+            compare('the import and edits', failures)
+            job = run_job(full=False)
+            print(f"incremental analysis: {job.result}")
+            compare('the incremental analysis', failures)
+
+    for f in failures:
+        print(f"FAIL: {f}")
+    if not failures:
+        print("OK: the dashboard counts match the vehicle table")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+# Gunicorn server hooks; the bind address and worker counts stay on the command line (see Dockerfile)
+
+
+def post_worker_init(worker):
+    """Start the job threads and warm-up in each worker, once app:app is loaded."""
+    from app import start_background_services
+
+    start_background_services()
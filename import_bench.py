@@ -0,0 +1,104 @@
+"""Import benchmark: the same vehicle list as Excel, CSV and Parquet.
+
+Writes ``--rows`` synthetic vehicles in each format, then imports every
+file into its own throw-away SQLite database in a fresh interpreter and
+reports the time spent reading and validating the file and the total
+import time:
+
+    python import_bench.py
+    python import_bench.py --rows 20000 --formats csv parquet
+
+Parquet needs pyarrow; it is skipped when pyarrow is not installed.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+COLUMNS = ['Plat Nomor', 'Jenis', 'Merk', 'Tipe', 'Tahun', 'Harga', 'Kondisi', 'KM']
+
+CHILD = r"""
+import json, sys, time
+from app import app
+from services.excel_service import ExcelService
+path, chunk_size = sys.argv[1], int(sys.argv[2])
+svc = ExcelService()
+with app.app_context():
+    start = time.perf_counter()
+    rows = 0
+    for first_row, df in svc.iter_file(path, chunk_size):
+        rows += len(svc.normalize_rows(df, first_row)[0])
+    read = time.perf_counter() - start
+    start = time.perf_counter()
+    ok, msg = svc.import_file(path, chunk_size)
+    total = time.perf_counter() - start
+print(json.dumps({'rows': rows, 'read': read, 'import': total, 'ok': ok, 'message': msg}))
+"""
+
+
+def vehicle_rows(n):
+    merk = ['Toyota', 'Honda', 'Mitsubishi', 'Suzuki', 'Yamaha']
+    kondisi = ['Baik', 'Rusak Ringan', 'Rusak Berat']
+    for i in range(n):
+        yield [f'B {i:06d} XX', 'Mobil' if i % 3 else 'Motor', merk[i % 5], f'Tipe {i % 40}',
+               2005 + i % 19, 50000000.0 + 1000 * (i % 5000), kondisi[i % 3], (i * 37) % 250000]
+
+
+def write_files(tmp, n, formats):
+    paths = {}
+    if 'xlsx' in formats:
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(COLUMNS)
+        for row in vehicle_rows(n):
+            ws.append(row)
+        paths['xlsx'] = os.path.join(tmp, 'vehicles.xlsx')
+        wb.save(paths['xlsx'])
+    if 'csv' in formats:
+        import csv
+        paths['csv'] = os.path.join(tmp, 'vehicles.csv')
+        with open(paths['csv'], 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(vehicle_rows(n))
+    if 'parquet' in formats:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("pyarrow not installed, skipping parquet")
+        else:
+            columns = list(zip(*vehicle_rows(n)))
+            pq.write_table(pa.table(dict(zip(COLUMNS, columns))), os.path.join(tmp, 'vehicles.parquet'))
+            paths['parquet'] = os.path.join(tmp, 'vehicles.parquet')
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--formats', nargs='+', default=['xlsx', 'csv', 'parquet'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        paths = write_files(tmp, args.rows, args.formats)
+        print(f"Wrote {args.rows} rows per format in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'format':<8} {'size MB':>8} {'read s':>8} {'import s':>9}  result")
+        for fmt, path in paths.items():
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, fmt + '.db')}",
+                       JOB_WORKERS='0', WARMUP='off', PYTHONWARNINGS='ignore')
+            proc = subprocess.run([sys.executable, '-c', CHILD, path, str(args.chunk_size)],
+                                  env=env, capture_output=True, text=True, check=True)
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{fmt:<8} {os.path.getsize(path) / 1e6:8.1f} {r['read']:8.2f} {r['import']:9.2f}  {r['message']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,120 @@
-import sqlite3
-
-def migrate():
-    conn = sqlite3.connect('instance/smart_bmn.db')
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("ALTER TABLE vehicle ADD COLUMN pengguna_saat_ini VARCHAR(100)")
-        print("Added pengguna_saat_ini column")
-    except sqlite3.OperationalError as e:
-        print(f"Skipped pengguna_saat_ini: {e}")
-
-    try:
-        cursor.execute("ALTER TABLE vehicle ADD COLUMN pejabat VARCHAR(100)")
-        print("Added pejabat column")
-    except sqlite3.OperationalError as e:
-        print(f"Skipped pejabat: {e}")
-
-    conn.commit()
-    conn.close()
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+
+# Applied migrations, one row per version
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def create_indexes(*names):
+    """Migration step creating the named model indexes if they do not exist yet."""
+    def step(conn):
+        from models import db
+
+        indexes = {ix.name: ix for table in db.metadata.tables.values() for ix in table.indexes}
+        for name in names:
+            conn.execute(CreateIndex(indexes[name], if_not_exists=True))
+    return step
+
+
+def rebuild_fleet_summary(conn):
+    from models.fleet_summary import rebuild
+
+    rebuild(conn)
+
+
+# (version, description, step). Steps receive a connection inside the transaction
+# that records the version and must be safe on a database that db.create_all()
+# just created with the current models. Append new versions; never edit applied ones.
+MIGRATIONS = [
+    (1, 'Indexes for list filters, foreign keys and the job queue', create_indexes(
+        'ix_vehicle_kondisi_saat_ini',
+        'ix_vehicle_rekomendasi_lelang',
+        'ix_vehicle_created_at',
+        'ix_vehicle_updated_at',
+        'ix_vehicle_inputs_changed_at',
+        'ix_damage_vehicle_id_status',
+        'ix_maintenance_vehicle_id_tanggal',
+        'ix_usage_history_vehicle_id_tanggal_mulai',
+        'ix_job_status_priority',
+    )),
+    (2, 'Dashboard counts in fleet_summary', rebuild_fleet_summary),
+    (3, 'Indexes for the vehicle list sorts', create_indexes(
+        'ix_vehicle_merk',
+        'ix_vehicle_tahun_perolehan',
+        'ix_vehicle_skor_sort',
+        'ix_vehicle_rekomendasi_skor_sort',
+    )),
+    (4, 'Index for the case-insensitive plate search', create_indexes('ix_vehicle_plat_upper')),
+]
+
+
+def add_missing_columns(engine):
+    """Add columns declared on the models but missing from an existing database.
+
+    db.create_all() only creates missing tables, so columns added to a model
+    after the database was first created are added here. Safe to run repeatedly.
+    """
+    from models import db
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+                print(f"Added {table.name}.{column.name} column")
+
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        return set(conn.execute(schema_version.select().with_only_columns(schema_version.c.version)).scalars())
+
+
+def migrate(engine):
+    """Bring an existing database up to the current models; safe to run at every startup.
+
+    Adds missing columns, then applies each MIGRATIONS step whose version is
+    not in ``schema_version`` yet, in its own transaction. The version row is
+    inserted before the step runs, so when several workers start at once the
+    first one holds the write lock and the others fail on the primary key
+    and skip the step instead of applying it twice.
+    """
+    add_missing_columns(engine)
+    schema_version.create(engine, checkfirst=True)
+
+    done = applied_versions(engine)
+    for version, description, step in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.connect() as conn:
+            try:
+                conn.execute(schema_version.insert().values(
+                    version=version, description=description, applied_at=datetime.now()))
+            except IntegrityError:
+                conn.rollback()
+                continue  # Applied by another process
+            step(conn)
+            conn.commit()
+        print(f"Applied migration {version}: {description}")
+
 
 if __name__ == "__main__":
-    migrate()
+    from app import app
+    from models import db
+
+    with app.app_context():
+        migrate(db.engine)
+        print(f"Schema version {max(applied_versions(db.engine), default=0)}")
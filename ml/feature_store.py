@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from ml.predictor import CATEGORICAL_COLS, FEATURES, build_feature_matrix
+
+NUMERIC_COLS = ['tahun_perolehan', 'harga_perolehan', 'jarak_tempuh']
+TARGET = 'nilai_pasar_real'
+COLUMNS = NUMERIC_COLS + CATEGORICAL_COLS + [TARGET]
+
+
+def iter_chunks(path, chunk_size=100000):
+    """Yield the training columns of a CSV, Parquet or Excel file as DataFrames of at most ``chunk_size`` rows."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        yield from pd.read_csv(path, usecols=COLUMNS, chunksize=chunk_size)
+    elif ext == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=COLUMNS):
+            yield batch.to_pandas()
+    elif ext == '.xlsx':
+        # Read-only openpyxl streams rows without loading the whole workbook
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(h) if h is not None else '' for h in next(rows)]
+            missing = [c for c in COLUMNS if c not in header]
+            if missing:
+                raise ValueError(f"Kolom tidak ditemukan: {', '.join(missing)}")
+            idx = [header.index(c) for c in COLUMNS]
+            buf = []
+            for row in rows:
+                buf.append([row[i] if i < len(row) else None for i in idx])
+                if len(buf) == chunk_size:
+                    yield pd.DataFrame(buf, columns=COLUMNS)
+                    buf = []
+            if buf:
+                yield pd.DataFrame(buf, columns=COLUMNS)
+        finally:
+            wb.close()
+    elif ext == '.xls':
+        # Legacy format has no streaming reader; read once, then chunk
+        df = pd.read_excel(path, usecols=COLUMNS)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise ValueError(f"Unsupported training file: {path}")
+
+
+def compact(chunk):
+    """Cast a raw chunk to compact dtypes; rows without a sale price are dropped."""
+    out = pd.DataFrame({
+        'tahun_perolehan': pd.to_numeric(chunk['tahun_perolehan'], errors='coerce').astype('float32'),
+        'harga_perolehan': pd.to_numeric(chunk['harga_perolehan'], errors='coerce').astype('float32'),
+        'jarak_tempuh': pd.to_numeric(chunk['jarak_tempuh'], errors='coerce').fillna(0).astype('float32'),
+        TARGET: pd.to_numeric(chunk[TARGET], errors='coerce').astype('float32'),
+    })
+    for col in CATEGORICAL_COLS:
+        # Same labels LabelEncoder sees in preprocess_data (missing -> 'nan')
+        out[col] = chunk[col].astype(str).astype('category')
+    return out[out[TARGET].notna() & out['tahun_perolehan'].notna()]
+
+
+def row_uniform(start, stop, seed):
+    """A uniform [0, 1) value per row index in [start, stop), from a splitmix64 hash of the index and seed."""
+    z = np.arange(start, stop, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    z += np.uint64(seed & 0xFFFFFFFFFFFFFFFF)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def write_npy_header(f, shape):
+    # Header of a float32 .npy whose data is appended afterwards
+    np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                                             'fortran_order': False, 'shape': shape})
+
+
+class FeatureStore:
+    """Preprocessed training data on disk, built chunk by chunk from a sales history file.
+
+    ``features.npy`` holds the FEATURES matrix (float32) and ``target.npy``
+    the sale prices. ``meta.json`` records the source hash and the label
+    classes. Building and reading keep only one chunk of rows in memory at a
+    time.
+
+    Each row belongs to the train or test split by a hash of its index, so
+    the split needs no per-row index array and does not depend on the chunk
+    size it is read with.
+    """
+
+    def __init__(self, path='ml/saved_models/feature_store'):
+        self.path = path
+
+    @staticmethod
+    def source_hash(data_path, block_size=1 << 20):
+        h = hashlib.sha256(str(datetime.now().year).encode())  # umur depends on the year
+        with open(data_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def meta(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def build(self, data_path, chunk_size=100000, source_hash=None):
+        """Build the store from ``data_path`` unless it already holds that file. Returns the meta dict."""
+        source_hash = source_hash or self.source_hash(data_path)
+        meta = self.meta()
+        if meta and meta['source_hash'] == source_hash:
+            return meta
+
+        os.makedirs(self.path, exist_ok=True)
+        if meta:
+            # Never leave the old meta next to half-replaced arrays
+            os.remove(os.path.join(self.path, 'meta.json'))
+        current_year = datetime.now().year
+        raw_features = os.path.join(self.path, 'features.raw.tmp')
+        raw_target = os.path.join(self.path, 'target.raw.tmp')
+        # Codes in first-seen order while streaming; sorted like LabelEncoder at the end
+        vocab = {col: {} for col in CATEGORICAL_COLS}
+        rows = 0
+        with open(raw_features, 'wb') as fx, open(raw_target, 'wb') as fy:
+            for chunk in iter_chunks(data_path, chunk_size):
+                chunk = compact(chunk)
+                for col in CATEGORICAL_COLS:
+                    codes = vocab[col]
+                    for label in chunk[col].cat.categories:
+                        codes.setdefault(label, len(codes))
+                X = build_feature_matrix(chunk, vocab, FEATURES, current_year)
+                fx.write(X.tobytes())
+                fy.write(chunk[TARGET].to_numpy(dtype=np.float32).tobytes())
+                rows += len(chunk)
+
+        classes = {col: sorted(codes) for col, codes in vocab.items()}
+        remap = {}
+        for col, codes in vocab.items():
+            order = np.empty(len(codes), dtype=np.float32)
+            for new_code, label in enumerate(classes[col]):
+                order[codes[label]] = new_code
+            remap[col] = order
+
+        # Copy into .npy files chunk by chunk, renumbering the labels
+        n_features = len(FEATURES)
+        with open(raw_features, 'rb') as src, open(os.path.join(self.path, 'features.npy.tmp'), 'wb') as dst:
+            write_npy_header(dst, (rows, n_features))
+            for _ in range(0, rows, chunk_size):
+                block = np.fromfile(src, dtype=np.float32, count=chunk_size * n_features).reshape(-1, n_features)
+                for col in CATEGORICAL_COLS:
+                    i = FEATURES.index(f'{col}_encoded')
+                    block[:, i] = remap[col][block[:, i].astype(np.int64)]
+                dst.write(block.tobytes())
+        with open(raw_target, 'rb') as src, open(os.path.join(self.path, 'target.npy.tmp'), 'wb') as dst:
+            write_npy_header(dst, (rows,))
+            for _ in range(0, rows, chunk_size):
+                dst.write(np.fromfile(src, dtype=np.float32, count=chunk_size).tobytes())
+
+        os.replace(os.path.join(self.path, 'features.npy.tmp'), os.path.join(self.path, 'features.npy'))
+        os.replace(os.path.join(self.path, 'target.npy.tmp'), os.path.join(self.path, 'target.npy'))
+        os.remove(raw_features)
+        os.remove(raw_target)
+
+        meta = {'source': os.path.abspath(data_path), 'source_hash': source_hash, 'rows': rows,
+                'year': current_year, 'features': FEATURES, 'classes': classes,
+                'built_at': datetime.now().isoformat()}
+        with open(os.path.join(self.path, 'meta.json.tmp'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(self.path, 'meta.json.tmp'), os.path.join(self.path, 'meta.json'))
+        return meta
+
+    def test_mask(self, start, stop, test_size=0.2, random_state=42):
+        """True for the rows in [start, stop) that are in the test split."""
+        return row_uniform(start, stop, random_state) < test_size
+
+    def iter_rows(self, chunk_size=100000):
+        """Yield (start, X, y) float32 blocks of ``chunk_size`` rows, read from the .npy files."""
+        with open(os.path.join(self.path, 'features.npy'), 'rb') as fx, \
+                open(os.path.join(self.path, 'target.npy'), 'rb') as fy:
+            for f in (fx, fy):
+                np.lib.format.read_magic(f)
+                shape, _, _ = np.lib.format.read_array_header_1_0(f)
+            rows, n_features = shape[0], len(FEATURES)
+            for start in range(0, rows, chunk_size):
+                y = np.fromfile(fy, dtype=np.float32, count=chunk_size)
+                X = np.fromfile(fx, dtype=np.float32, count=len(y) * n_features).reshape(-1, n_features)
+                yield start, X, y
+
+    def iter_part(self, part, chunk_size=100000, test_size=0.2, random_state=42):
+        """Yield (X, y) of the 'train' or 'test' rows, one chunk of the store at a time."""
+        for start, X, y in self.iter_rows(chunk_size):
+            keep = self.test_mask(start, start + len(y), test_size, random_state)
+            if part == 'train':
+                keep = ~keep
+            yield X[keep], y[keep]
+
+    def sample(self, max_rows, chunk_size=100000, test_size=0.2, random_state=42):
+        """The training rows as (X, y) DataFrame and Series, at most ``max_rows`` of them.
+
+        A store with more training rows than that is sampled uniformly, so
+        the memory used for fitting stops growing with the file size.
+        """
+        rows = self.meta()['rows']
+        n_train = sum(int((~self.test_mask(start, min(start + chunk_size, rows), test_size, random_state)).sum())
+                      for start in range(0, rows, chunk_size))
+        fraction = min(1.0, max_rows / n_train) if n_train else 1.0
+        X = np.empty((min(max_rows, n_train), len(FEATURES)), dtype=np.float32)
+        y = np.empty(len(X), dtype=np.float32)
+        filled = 0
+        for start, X_chunk, y_chunk in self.iter_rows(chunk_size):
+            stop = start + len(y_chunk)
+            keep = ~self.test_mask(start, stop, test_size, random_state)
+            if fraction < 1.0:
+                keep &= row_uniform(start, stop, random_state + 1) < fraction
+            n = min(int(keep.sum()), len(X) - filled)
+            X[filled:filled + n] = X_chunk[keep][:n]
+            y[filled:filled + n] = y_chunk[keep][:n]
+            filled += n
+            if filled == len(X):
+                break
+        return (pd.DataFrame(X[:filled], columns=FEATURES, copy=False),
+                pd.Series(y[:filled], name=TARGET, copy=False))
+
+    def encoders(self):
+        """LabelEncoders equivalent to fitting on the whole source file."""
+        encoders = {}
+        for col, classes in self.meta()['classes'].items():
+            le = LabelEncoder()
+            le.classes_ = np.asarray(classes, dtype=object)
+            encoders[f'le_{col}'] = le
+        return encoders
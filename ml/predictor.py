@@ -2,66 +2,294 @@ import joblib
 import os
 import pandas as pd
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import numpy as np
 
+CATEGORICAL_COLS = ['kondisi_saat_ini', 'jenis', 'merk', 'tipe']
+FEATURES = ['umur', 'harga_perolehan', 'jarak_tempuh'] + [f'{col}_encoded' for col in CATEGORICAL_COLS]
+# Only known for vehicles in the database (services.fleet_data): open damages
+# and the last 12 months of maintenance cost. Models trained from sales
+# history files use FEATURES alone; best_model.json lists what a model uses.
+FLEET_FEATURES = ['open_damage_count', 'annual_maint']
+
+
+def build_feature_matrix(df, vocab, features=FEATURES, current_year=None):
+    """Encode a frame of vehicles into the float32 matrix for ``features``.
+
+    The one feature definition shared by MLTrainer, FeatureStore and
+    MLPredictor. ``vocab`` maps each categorical column to {label: code};
+    unknown labels, missing columns and missing values become 0.
+    """
+    current_year = current_year or datetime.now().year
+    X = np.zeros((len(df), len(features)), dtype=np.float32)
+    for i, feature in enumerate(features):
+        if feature == 'umur':
+            X[:, i] = current_year - df['tahun_perolehan'].to_numpy(dtype=np.float64)
+        elif feature.endswith('_encoded'):
+            col = feature[:-len('_encoded')]
+            if vocab.get(col) and col in df:
+                X[:, i] = df[col].astype(str).map(vocab[col]).fillna(0).to_numpy(dtype=np.float64)
+        elif feature in df:
+            X[:, i] = pd.to_numeric(df[feature], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    return X
+
+
+class CompiledModel:
+    """Best model flattened into NumPy arrays by MLTrainer.export_compiled.
+
+    Tree ensembles are stored as one node table for all trees (feature,
+    threshold, left/right child, leaf value; leaves point at themselves) and
+    evaluated for a whole batch at once, one tree level per step. Serving it
+    needs neither scikit-learn nor xgboost.
+    """
+
+    def __init__(self, arrays):
+        self.kind = str(arrays['kind']) # forest, xgboost or linear
+        if self.kind == 'linear':
+            self.coef = arrays['coef']
+            self.intercept = float(arrays['intercept'])
+            return
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.default_left = arrays['default_left']
+        self.max_depth = int(arrays['max_depth'])
+        self.base_score = arrays['base_score']
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if self.kind == 'linear':
+            return X @ self.coef + self.intercept
+
+        rows = np.arange(len(X))[:, None]
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            threshold = self.threshold[node]
+            if self.kind == 'xgboost':
+                # XGBoost: left if x < split, missing values follow the default branch
+                go_left = (x < threshold) | (np.isnan(x) & self.default_left[node])
+            else:
+                # scikit-learn: left if x <= threshold
+                go_left = x <= threshold
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        # Accumulate tree by tree, in the same order and precision as the original model
+        leaf = self.value[node]
+        if self.kind == 'xgboost':
+            out = np.full(len(X), self.base_score, dtype=np.float32)
+            for t in range(leaf.shape[1]):
+                out += leaf[:, t]
+            return out
+        out = np.zeros(len(X))
+        for t in range(leaf.shape[1]):
+            out += leaf[:, t]
+        return out / leaf.shape[1]
+
+class PredictionCache:
+    """Bounded LRU of predictions keyed on (model version, encoded feature row).
+
+    Fleets repeat the same merk/tipe/tahun combinations, so most rows have
+    been predicted before. Shared by every predictor in the process; the
+    registry clears it when it swaps in a new model.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get_many(self, version, keys):
+        """Cached values for ``keys`` (NaN where missing) and the indices of the misses."""
+        values = np.full(len(keys), np.nan)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._data.get((version, key))
+                if value is None:
+                    missing.append(i)
+                else:
+                    self._data.move_to_end((version, key))
+                    values[i] = value
+            self._stats['hits'] += len(keys) - len(missing)
+            self._stats['misses'] += len(missing)
+        return values, np.asarray(missing, dtype=np.int64)
+
+    def put_many(self, version, keys, values):
+        if len(keys) > self.max_size:
+            # The rest would be evicted by this same call
+            self._count_evictions(len(keys) - self.max_size)
+            keys, values = keys[-self.max_size:], values[-self.max_size:]
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._data[(version, key)] = float(value)
+            overflow = len(self._data) - self.max_size
+            for _ in range(max(0, overflow)):
+                self._data.popitem(last=False)
+            self._stats['evictions'] += max(0, overflow)
+
+    def _count_evictions(self, n):
+        with self._lock:
+            self._stats['evictions'] += n
+
+    def invalidate(self):
+        with self._lock:
+            self._data.clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._data), max_size=self.max_size)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
 class MLPredictor:
-    def __init__(self, model_path='ml/saved_models'):
+    def __init__(self, model_path='ml/saved_models', chunk_size=10000, cache=None, version=None, mileage_bucket=0):
         self.model_path = model_path
+        self.chunk_size = chunk_size
+        # Optional PredictionCache; ``version`` identifies these artifacts in its keys
+        self.cache = cache
+        self.version = version
+        # Round jarak_tempuh to this many km before predicting (0 = exact) so more rows share a cache entry
+        self.mileage_bucket = mileage_bucket
+        self.compiled_classes = None
+        self.features = FEATURES
         self.load_best_model()
         self.load_encoders()
-        
+
     def load_best_model(self):
         try:
             with open(os.path.join(self.model_path, 'best_model.json'), 'r') as f:
                 info = json.load(f)
                 best_name = info['best_model']
-                self.model = joblib.load(os.path.join(self.model_path, f'{best_name}.pkl'))
+                # Models trained before the feature list was recorded use FEATURES
+                self.features = info.get('features', FEATURES)
+                compiled = info.get('compiled')
+                if compiled and os.path.exists(os.path.join(self.model_path, compiled)):
+                    # Pure NumPy runtime, encoders included
+                    with np.load(os.path.join(self.model_path, compiled), allow_pickle=False) as arrays:
+                        arrays = dict(arrays)
+                    self.model = CompiledModel(arrays)
+                    self.compiled_classes = {col: arrays[f'classes_{col}'] for col in CATEGORICAL_COLS}
+                else:
+                    self.model = joblib.load(os.path.join(self.model_path, f'{best_name}.pkl'))
                 self.model_name = best_name
         except:
             self.model = None
             print("No model found. Please train first.")
-            
+
     def load_encoders(self):
+        # Label -> code dicts give O(1) lookups instead of scanning le.classes_
+        self.encoders = {}
+        self.vocab = {}
+        if self.compiled_classes is not None:
+            for col, classes in self.compiled_classes.items():
+                self.vocab[col] = {str(label): code for code, label in enumerate(classes)}
+            return
         try:
-            self.encoders = {}
-            for col in ['kondisi_saat_ini', 'jenis', 'merk', 'tipe']:
-                self.encoders[f'le_{col}'] = joblib.load(os.path.join(self.model_path, f'le_{col}.pkl'))
+            for col in CATEGORICAL_COLS:
+                le = joblib.load(os.path.join(self.model_path, f'le_{col}.pkl'))
+                self.encoders[f'le_{col}'] = le
+                self.vocab[col] = {str(label): code for code, label in enumerate(le.classes_)}
         except:
             print("Encoders not found.")
 
+    def build_features(self, df):
+        """Encode a frame of vehicles into the float32 feature matrix used by the model."""
+        X = build_feature_matrix(df, self.vocab, self.features)
+        if self.mileage_bucket and 'jarak_tempuh' in self.features:
+            i = self.features.index('jarak_tempuh')
+            X[:, i] = np.round(X[:, i] / self.mileage_bucket) * self.mileage_bucket
+        return X
+
+    def predict_many(self, vehicles, chunk_size=None):
+        """Predict market value for many vehicles with one model call per chunk.
+
+        ``vehicles`` is a DataFrame or a list of dicts with the same keys as
+        ``predict``. Returns a float array, clipped at zero.
+        """
+        df = vehicles if isinstance(vehicles, pd.DataFrame) else pd.DataFrame.from_records(list(vehicles))
+        if not self.model or df.empty:
+            return np.zeros(len(df))
+
+        X = self.build_features(df)
+        if self.cache is None:
+            return np.maximum(0, self._predict_matrix(X, chunk_size)) # No negative value
+
+        # Predict each distinct feature row once, and only if it is not cached.
+        # Rows are compared as raw bytes: one void scalar per row.
+        row_bytes = np.ascontiguousarray(X).view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+        unique_rows, first, inverse = np.unique(row_bytes, return_index=True, return_inverse=True)
+        keys = unique_rows.tolist()
+        preds, missing = self.cache.get_many(self.version, keys)
+        if len(missing):
+            preds[missing] = self._predict_matrix(X[first[missing]], chunk_size)
+            self.cache.put_many(self.version, [keys[i] for i in missing], preds[missing])
+        return np.maximum(0, preds[inverse.ravel()]) # No negative value
+
+    def _predict_matrix(self, X, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        preds = np.empty(len(X))
+        for start in range(0, len(X), chunk_size):
+            chunk = X[start:start + chunk_size]
+            if not isinstance(self.model, CompiledModel):
+                chunk = pd.DataFrame(chunk, columns=self.features)
+            preds[start:start + chunk_size] = self.model.predict(chunk)
+        return preds
+
     def predict(self, vehicle_data):
         # vehicle_data is a dict or object
         if not self.model:
             return 0
-            
-        current_year = datetime.now().year
-        umur = current_year - vehicle_data['tahun_perolehan']
-        
-        # Safe encoding
-        encoded_values = {}
-        for col in ['kondisi_saat_ini', 'jenis', 'merk', 'tipe']:
-            try:
-                le = self.encoders[f'le_{col}']
-                val = str(vehicle_data.get(col, ''))
-                # Handle unknown labels
-                if val in le.classes_:
-                    encoded_values[f'{col}_encoded'] = le.transform([val])[0]
-                else:
-                    # Fallback to most frequent or default (0)
-                    encoded_values[f'{col}_encoded'] = 0 
-            except:
-                encoded_values[f'{col}_encoded'] = 0
-
-        features = pd.DataFrame([[
-            umur, 
-            vehicle_data['harga_perolehan'],
-            vehicle_data['jarak_tempuh'],
-            encoded_values['kondisi_saat_ini_encoded'],
-            encoded_values['jenis_encoded'],
-            encoded_values['merk_encoded'],
-            encoded_values['tipe_encoded']
-        ]], columns=['umur', 'harga_perolehan', 'jarak_tempuh', 'kondisi_saat_ini_encoded', 'jenis_encoded', 'merk_encoded', 'tipe_encoded'])
-        
-        prediction = self.model.predict(features)[0]
-        return max(0, prediction) # No negative value
+        return self.predict_many([vehicle_data])[0]
+
+if __name__ == "__main__":
+    # Latency benchmark: per-row predict() vs. batched predict_many()
+    import time
+
+    predictor = MLPredictor()
+    rng = np.random.default_rng(42)
+    n_max = 10000
+    fleet = pd.DataFrame({
+        'tahun_perolehan': rng.integers(2005, 2024, n_max),
+        'harga_perolehan': rng.integers(150000000, 800000000, n_max).astype(float),
+        'jarak_tempuh': rng.integers(5000, 150000, n_max),
+        'kondisi_saat_ini': rng.choice(['Baik', 'Rusak Ringan', 'Rusak Berat'], n_max),
+        'jenis': rng.choice(['Mobil', 'Motor'], n_max),
+        'merk': rng.choice(['Toyota', 'Honda', 'Mitsubishi', 'Suzuki'], n_max),
+        'tipe': rng.choice(['Avanza', 'Civic', 'Pajero', 'Ertiga'], n_max)
+    })
+
+    print(f"{'rows':>6} {'predict (us/row)':>18} {'predict_many (us/row)':>22}")
+    for n in [1, 100, 10000]:
+        rows = fleet.head(n)
+        records = rows.to_dict('records')
+
+        # Cap the slow per-row loop so the 10k case finishes quickly
+        sample = records[:min(n, 500)]
+        start = time.perf_counter()
+        for r in sample:
+            predictor.predict(r)
+        per_row = (time.perf_counter() - start) / len(sample) * 1e6
+
+        start = time.perf_counter()
+        predictor.predict_many(rows)
+        batched = (time.perf_counter() - start) / n * 1e6
+
+        print(f"{n:>6} {per_row:>18.1f} {batched:>22.1f}")
+
+    # Prediction cache: the benchmark fleet has few distinct rows once mileage is bucketed
+    cached = MLPredictor(cache=PredictionCache(), version='bench', mileage_bucket=5000)
+    for label in ['cold', 'warm']:
+        start = time.perf_counter()
+        cached.predict_many(fleet)
+        print(f"cached predict_many ({label}, {n_max} rows): {(time.perf_counter() - start) * 1e3:.1f} ms")
+    print(cached.cache.stats())
@@ -0,0 +1,131 @@
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+# ml.predictor (pandas, joblib) is imported on the first get_predictor() call
+
+
+class ModelRegistry:
+    """Process-wide cache of the loaded MLPredictor.
+
+    The predictor (best model + label encoders) is loaded once per worker and
+    shared by every request. ``best_model.json`` is written last by
+    ``MLTrainer.train_all``, so its mtime is used as the artifact version: when
+    it changes the next caller loads the new artifacts and swaps them in.
+    Requests already holding the old predictor keep using it undisturbed.
+
+    The registry also owns the process-wide PredictionCache, keyed on the
+    artifact version and cleared whenever a new version is loaded.
+    """
+
+    def __init__(self, model_path='ml/saved_models', cache_size=10000, mileage_bucket=0):
+        self.model_path = model_path
+        self.cache_size = cache_size
+        self.mileage_bucket = mileage_bucket
+        self.prediction_cache = None
+        self._current = (None, None)  # (version, predictor), replaced atomically
+        self._metrics = (None, None)  # (version, parsed best_model.json metrics)
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'loads': 0, 'load_time': 0.0, 'last_load_time': 0.0, 'hits': 0, 'misses': 0}
+
+    def init_app(self, app):
+        self.cache_size = app.config.get('ML_PREDICTION_CACHE_SIZE', self.cache_size)
+        self.mileage_bucket = app.config.get('ML_MILEAGE_BUCKET', self.mileage_bucket)
+        # Rebuilt with the configured size on the next load
+        self._current = (None, None)
+        self.prediction_cache = None
+
+    def artifact_version(self):
+        try:
+            st = os.stat(os.path.join(self.model_path, 'best_model.json'))
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def artifact_updated_at(self):
+        version = self.artifact_version()
+        return datetime.fromtimestamp(version[0] / 1e9) if version else None
+
+    def metrics(self):
+        """The ``metrics`` of ``best_model.json`` (NaN as 0.0), parsed once per artifact version.
+
+        None when there is no readable model file. The dict is shared; do not modify it.
+        """
+        version = self.artifact_version()
+        cached_version, metrics = self._metrics
+        if cached_version == version:
+            return metrics
+
+        metrics = None
+        if version is not None:
+            try:
+                with open(os.path.join(self.model_path, 'best_model.json'), 'r') as f:
+                    metrics = json.load(f).get('metrics', {})
+                for model_metrics in metrics.values():
+                    for key, value in model_metrics.items():
+                        if isinstance(value, float) and math.isnan(value):
+                            model_metrics[key] = 0.0
+            except (OSError, ValueError, AttributeError):
+                metrics = None
+        self._metrics = (version, metrics)
+        return metrics
+
+    def get_predictor(self):
+        version = self.artifact_version()
+        current_version, predictor = self._current
+        if predictor is not None and current_version == version:
+            self._count('hits')
+            return predictor
+
+        with self._load_lock:
+            # Another thread may have loaded this version while we waited
+            current_version, predictor = self._current
+            if predictor is not None and current_version == version:
+                self._count('hits')
+                return predictor
+
+            from ml.predictor import MLPredictor, PredictionCache
+
+            self._count('misses')
+            start = time.perf_counter()
+            if self.cache_size and self.prediction_cache is None:
+                self.prediction_cache = PredictionCache(self.cache_size)
+            elif self.prediction_cache is not None:
+                self.prediction_cache.invalidate()  # Entries of the old version can never hit again
+            predictor = MLPredictor(self.model_path, cache=self.prediction_cache, version=version,
+                                    mileage_bucket=self.mileage_bucket)
+            elapsed = time.perf_counter() - start
+            self._current = (version, predictor)
+
+        with self._stats_lock:
+            self._stats['loads'] += 1
+            self._stats['load_time'] += elapsed
+            self._stats['last_load_time'] = elapsed
+        return predictor
+
+    def invalidate(self):
+        self._current = (None, None)
+        if self.prediction_cache is not None:
+            self.prediction_cache.invalidate()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        cache = self.prediction_cache
+        stats['prediction_cache'] = cache.stats() if cache is not None else None
+        return stats
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+
+registry = ModelRegistry()
+
+
+def get_predictor():
+    return registry.get_predictor()
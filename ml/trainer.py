@@ -1,21 +1,144 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, KFold, ParameterGrid
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from xgboost import XGBRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.metrics import r2_score
 from sklearn.preprocessing import LabelEncoder
+import hashlib
 import joblib
+import math
+import multiprocessing
 import os
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from joblib import Memory, Parallel, delayed
+from ml.feature_store import FeatureStore
+from ml.predictor import CATEGORICAL_COLS, FEATURES, FLEET_FEATURES, CompiledModel, build_feature_matrix
+
+# XGBoost in halving search: rounds are picked by early stopping on the
+# validation split instead of searching n_estimators
+EARLY_STOPPING_ROUNDS = 20
+MAX_BOOSTING_ROUNDS = 1000
+
+
+def halving_search(estimator, param_grid, X, y, deadline=None, eta=3, min_samples=200, n_jobs=1, random_state=42):
+    """Successive halving over ``param_grid``, scored by R2 on a validation split.
+
+    Every candidate is fitted on a small sample. The best 1/eta of them move
+    on to a sample eta times larger, and this repeats until one candidate
+    has been fitted on the whole fit split. Then it is refitted on all of
+    X (except early-stopped XGBoost, which keeps its validation split). No
+    new fit starts after ``deadline`` (a time.time() value). In that case
+    the best model fitted so far is returned.
+
+    Returns (model, fit_time, info), with model None if nothing was fitted.
+    Runs in a worker process, so it is a module-level function.
+    """
+    start = time.perf_counter()
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.2, random_state=random_state)
+    early_stopping = isinstance(estimator, XGBRegressor)
+    if early_stopping:
+        param_grid = {k: v for k, v in param_grid.items() if k != 'n_estimators'}
+
+    candidates = list(ParameterGrid(param_grid)) if param_grid else [{}]
+    n_candidates = len(candidates)
+    n_rungs = math.ceil(math.log(len(candidates), eta)) if len(candidates) > 1 else 0
+    n_samples = max(min_samples, len(X_fit) // eta ** n_rungs)
+
+    best = None  # (rung, score, params, model)
+    fits = 0
+    timed_out = False
+    for rung in range(n_rungs + 1):
+        size = len(X_fit) if rung == n_rungs else min(len(X_fit), n_samples * eta ** rung)
+        scored = []
+        for params in candidates:
+            if deadline is not None and time.time() >= deadline:
+                timed_out = True
+                break
+            model = clone(estimator).set_params(**params)
+            if 'n_jobs' in model.get_params():
+                model.set_params(n_jobs=n_jobs)
+            if early_stopping:
+                model.set_params(n_estimators=MAX_BOOSTING_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+                model.fit(X_fit.iloc[:size], y_fit.iloc[:size], eval_set=[(X_val, y_val)], verbose=False)
+            else:
+                model.fit(X_fit.iloc[:size], y_fit.iloc[:size])
+            fits += 1
+            score = r2_score(y_val, model.predict(X_val))
+            scored.append((score, params, model))
+            if best is None or (rung, score) > best[:2]:
+                best = (rung, score, params, model)
+        if timed_out:
+            break
+        scored.sort(key=lambda c: c[0], reverse=True)
+        candidates = [params for _, params, _ in scored[:max(1, math.ceil(len(scored) / eta))]]
+
+    if best is None:
+        return None, time.perf_counter() - start, {'candidates': n_candidates, 'fits': 0, 'timed_out': True}
+
+    rung, score, params, model = best
+    if not early_stopping and not timed_out and (deadline is None or time.time() < deadline):
+        model = clone(model).fit(X, y)
+        fits += 1
+    info = {'best_params': params, 'val_r2': score, 'candidates': n_candidates, 'rungs': rung + 1, 'fits': fits, 'timed_out': timed_out}
+    if early_stopping:
+        info['best_iteration'] = int(model.best_iteration)
+    return model, time.perf_counter() - start, info
+
+
+def cv_fold_score(estimator, params, X, y, fold, n_folds, data_key):
+    """R2 of one grid point on one CV fold (unshuffled KFold, as GridSearchCV).
+
+    MLTrainer memoizes this on disk keyed by everything except X and y,
+    which ``data_key`` stands for.
+    """
+    train_idx, test_idx = list(KFold(n_folds).split(X))[fold]
+    model = clone(estimator).set_params(**params).fit(X.iloc[train_idx], y.iloc[train_idx])
+    return r2_score(y.iloc[test_idx], model.predict(X.iloc[test_idx]))
+
+
+def fit_model(estimator, params, X, y, data_key):
+    """Final fit of the chosen grid point; memoized like cv_fold_score."""
+    return clone(estimator).set_params(**params).fit(X, y)
+
+
+def test_metrics(model, chunks):
+    """MAE, RMSE and R2 of ``model`` over (X, y) chunks, accumulated one chunk at a time."""
+    n = 0
+    abs_err = sq_err = 0.0
+    mean = m2 = 0.0  # Running mean and sum of squared deviations of y (Chan et al.)
+    for X, y in chunks:
+        if not len(y):
+            continue
+        y = np.asarray(y, dtype=np.float64)
+        err = y - model.predict(X)
+        abs_err += np.abs(err).sum()
+        sq_err += np.square(err).sum()
+        k = len(y)
+        delta = y.mean() - mean
+        m2 += np.square(y - y.mean()).sum() + delta ** 2 * n * k / (n + k)
+        mean += delta * k / (n + k)
+        n += k
+    return {'MAE': abs_err / n, 'RMSE': np.sqrt(sq_err / n), 'R2': 1 - sq_err / m2 if m2 else float(sq_err == 0)}
+
 
 class MLTrainer:
-    def __init__(self, model_path='ml/saved_models'):
+    def __init__(self, model_path='ml/saved_models', cache_bytes_limit='1G'):
         self.model_path = model_path
         if not os.path.exists(self.model_path):
             os.makedirs(self.model_path)
+
+        # Fold scores and final fits, keyed by data hash + estimator + params.
+        # Least recently used entries are evicted past cache_bytes_limit.
+        self.cache_bytes_limit = cache_bytes_limit
+        self.memory = Memory(os.path.join(self.model_path, 'cache'), verbose=0)
+        self._cv_fold_score = self.memory.cache(cv_fold_score, ignore=['X', 'y'])
+        self._fit_model = self.memory.cache(fit_model, ignore=['X', 'y'])
             
         # Base models for GridSearch
         self.models = {
@@ -41,84 +164,341 @@ class MLTrainer:
             }
         }
         
+    def data_hash(self, df):
+        """Content hash of the columns training reads, plus the year used for umur."""
+        cols = ['tahun_perolehan', 'harga_perolehan', 'jarak_tempuh', 'nilai_pasar_real'] + CATEGORICAL_COLS
+        cols += [c for c in FLEET_FEATURES if c in df]
+        h = hashlib.sha256()
+        h.update(json.dumps([datetime.now().year, cols, [str(df[c].dtype) for c in cols]]).encode())
+        h.update(pd.util.hash_pandas_object(df[cols], index=False).to_numpy().tobytes())
+        return h.hexdigest()
+
+    def training_key(self, data_hash, search, time_budget, max_rows=None):
+        """Hash of the data, the candidate grids and the library versions."""
+        import sklearn
+        import xgboost
+        grids = {name: [type(c['model']).__name__, c['model'].get_params(), c['params']]
+                 for name, c in self.models.items()}
+        spec = [data_hash, grids, search, time_budget if search == 'halving' else None, max_rows,
+                sklearn.__version__, xgboost.__version__]
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _load_cached_run(self, training_key):
+        # The saved artifacts came from the same data and grid: nothing to do
+        try:
+            with open(os.path.join(self.model_path, 'best_model.json'), 'r') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if info.get('training_key') != training_key:
+            return None
+        needed = [f'{name}.pkl' for name in info['metrics']] + [f'le_{col}.pkl' for col in CATEGORICAL_COLS]
+        if not all(os.path.exists(os.path.join(self.model_path, f)) for f in needed):
+            return None
+        return info['metrics']
+
+    def load_feature_store(self, data_path, chunk_size=100000, source_hash=None):
+        """Build (or reuse) the FeatureStore for ``data_path``, save its encoders and return it."""
+        store = FeatureStore(os.path.join(self.model_path, 'feature_store'))
+        meta = store.build(data_path, chunk_size, source_hash)
+        print(f"Feature store: {meta['rows']} rows from {meta['source']}")
+        self.encoders = store.encoders()
+        for name, le in self.encoders.items():
+            self._save_artifact(le, f'{name}.pkl')
+        return store
+
     def preprocess_data(self, df):
-        # Feature Engineering
-        # Calculate Age
-        current_year = datetime.now().year
-        df['umur'] = current_year - df['tahun_perolehan']
-        
         # Encode Categorical
         encoders = {}
-        categorical_cols = ['kondisi_saat_ini', 'jenis', 'merk', 'tipe']
+        vocab = {}
         
-        for col in categorical_cols:
+        for col in CATEGORICAL_COLS:
             le = LabelEncoder()
             # Handle potential missing values or enforce string type
-            df[f'{col}_encoded'] = le.fit_transform(df[col].astype(str))
+            le.fit(df[col].astype(str))
             encoders[f'le_{col}'] = le
+            vocab[col] = {str(label): code for code, label in enumerate(le.classes_)}
             
             # Save encoder
-            joblib.dump(le, os.path.join(self.model_path, f'le_{col}.pkl'))
+            self._save_artifact(le, f'le_{col}.pkl')
+        self.encoders = encoders
         
-        # Select Features
-        features = ['umur', 'harga_perolehan', 'jarak_tempuh'] + [f'{col}_encoded' for col in categorical_cols]
+        # Same feature definition as MLPredictor; fleet features only when the frame has them
+        features = FEATURES + [c for c in FLEET_FEATURES if c in df]
+        X = pd.DataFrame(build_feature_matrix(df, vocab, features), columns=features, index=df.index)
         target = 'nilai_pasar_real'
         
-        return df[features], df[target]
+        return X, df[target]
 
-    def train_all(self, data_path=None, df=None):
-        if df is None and data_path:
-            df = pd.read_excel(data_path)
-        
-        if df is None:
+    def train_all(self, data_path=None, df=None, progress=None, search='grid', time_budget=None, max_workers=None,
+                  chunk_size=100000, max_rows=500000):
+        """Fit every candidate family, save them and mark the best one.
+
+        ``df`` is trained on in memory. ``data_path`` (CSV, Parquet or Excel
+        sales history) is streamed into a FeatureStore under model_path,
+        ``chunk_size`` rows at a time. The models are fitted on at most
+        ``max_rows`` of its training rows, sampled uniformly when the file
+        has more, and scored on all of its test rows one chunk at a time.
+        Peak memory therefore depends on ``chunk_size`` and ``max_rows``, not
+        on the file size.
+
+        ``search='grid'`` runs the exhaustive GridSearchCV for each family in
+        turn. ``search='halving'`` runs the families concurrently in a
+        process pool, each with successive halving, and XGBoost with early
+        stopping. The search stops after ``time_budget`` seconds. The budget
+        is checked between fits, so it can be overrun by at most one fit.
+
+        progress(name, index, total) is called before each model is fitted
+        (grid) or as each family finishes (halving).
+        """
+        if df is not None:
+            data_hash = self.data_hash(df)
+        elif data_path:
+            data_hash = FeatureStore.source_hash(data_path)
+        else:
             return None
+
+        training_key = self.training_key(data_hash, search, time_budget, max_rows if df is None else None)
+        cached = self._load_cached_run(training_key)
+        if cached is not None:
+            print("Training data and grid unchanged, keeping the saved models.")
+            return cached
             
-        X, y = self.preprocess_data(df)
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        if df is not None:
+            X, y = self.preprocess_data(df)
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            features = list(X.columns)
+            test_chunks = lambda: [(X_test, y_test)]
+        else:
+            store = self.load_feature_store(data_path, chunk_size, data_hash)
+            X_train, y_train = store.sample(max_rows, chunk_size)
+            features = FEATURES
+            test_chunks = lambda: ((pd.DataFrame(X, columns=FEATURES), y)
+                                   for X, y in store.iter_part('test', chunk_size))
         
+        print("Training models...")
+        start = time.time()
+        if search == 'halving':
+            fitted = self._search_parallel(X_train, y_train, progress, time_budget, max_workers)
+        else:
+            fitted = self._search_grid(X_train, y_train, progress, data_key=f'{data_hash}:train')
+
         results = {}
         best_score = -float('inf')
         best_model_name = ''
-        
-        print("Training models...")
-        
-        for name, config in self.models.items():
-            print(f"Optimizing {name}...")
-            
-            if config['params']:
-                grid = GridSearchCV(config['model'], config['params'], cv=3, scoring='r2', n_jobs=-1)
-                grid.fit(X_train, y_train)
-                model = grid.best_estimator_
-                print(f"  Best params for {name}: {grid.best_params_}")
-            else:
-                model = config['model']
-                model.fit(X_train, y_train)
-                
-            preds = model.predict(X_test)
-            
-            mae = mean_absolute_error(y_test, preds)
-            rmse = np.sqrt(mean_squared_error(y_test, preds))
-            r2 = r2_score(y_test, preds)
-            
-            results[name] = {
-                'MAE': mae,
-                'RMSE': rmse,
-                'R2': r2
-            }
+        for name, (model, fit_time, search_info) in fitted.items():
+            metrics = test_metrics(model, test_chunks())
+            r2 = metrics['R2']
+
+            results[name] = dict(metrics, fit_time=fit_time)
             
             # Save every model
-            joblib.dump(model, os.path.join(self.model_path, f'{name}.pkl'))
+            self._save_artifact(model, f'{name}.pkl')
             
             if r2 > best_score:
                 best_score = r2
                 best_model_name = name
+
+        if not best_model_name:
+            print("No model finished within the time budget.")
+            return None
                 
-        # Save best model reference
-        with open(os.path.join(self.model_path, 'best_model.json'), 'w') as f:
-            json.dump({'best_model': best_model_name, 'metrics': results}, f)
-            
+        info = {'best_model': best_model_name, 'metrics': results, 'features': features,
+                'training_key': training_key, 'data_hash': data_hash,
+                'search': {'mode': search, 'time_budget': time_budget, 'elapsed': time.time() - start,
+                           'families': {name: f[2] for name, f in fitted.items()}}}
+
+        # Compiled NumPy runtime for serving, used only if it reproduces the model
+        parity = self.export_compiled(fitted[best_model_name][0], next(iter(test_chunks()))[0])
+        if parity:
+            info['compiled'] = 'compiled_model.npz'
+            info['compiled_parity'] = parity
+
+        # Save best model reference last: its mtime is the artifact version
+        # watched by ml.registry, so predictors reload only once everything is on disk
+        best_path = os.path.join(self.model_path, 'best_model.json')
+        with open(best_path + '.tmp', 'w') as f:
+            json.dump(info, f)
+        os.replace(best_path + '.tmp', best_path)
+
+        self.memory.reduce_size(bytes_limit=self.cache_bytes_limit)
         return results
 
+    def _search_grid(self, X_train, y_train, progress=None, data_key=None, cv=3):
+        # Exhaustive grid with 3-fold CV like GridSearchCV, but every fold and
+        # the final fit go through the disk memo, so only new grid points are fitted
+        fitted = {}
+        for i, (name, config) in enumerate(self.models.items()):
+            print(f"Optimizing {name}...")
+            if progress:
+                progress(name, i, len(self.models))
+
+            start = time.perf_counter()
+            estimator = config['model']
+            data_key = data_key or joblib.hash((X_train, y_train))
+            calls = []
+            best_params = {}
+            candidates = list(ParameterGrid(config['params'])) if config['params'] else []
+            if candidates:
+                calls = [(params, fold) for params in candidates for fold in range(cv)]
+                cached = sum(self._cv_fold_score.check_call_in_cache(estimator, params, None, None, fold, cv, data_key)
+                             for params, fold in calls)
+                scores = Parallel(n_jobs=-1)(
+                    delayed(self._cv_fold_score)(estimator, params, X_train, y_train, fold, cv, data_key)
+                    for params, fold in calls)
+                mean_scores = np.asarray(scores).reshape(len(candidates), cv).mean(axis=1)
+                best_params = candidates[int(np.argmax(mean_scores))]
+                print(f"  Best params for {name}: {best_params}")
+            else:
+                cached = 0
+            cached += self._fit_model.check_call_in_cache(estimator, best_params, None, None, data_key)
+            model = self._fit_model(estimator, best_params, X_train, y_train, data_key)
+            search_info = {'best_params': best_params, 'candidates': max(1, len(candidates)),
+                           'fits': len(calls) + 1, 'cached_fits': int(cached)}
+            fitted[name] = (model, time.perf_counter() - start, search_info)
+        return fitted
+
+    def _search_parallel(self, X_train, y_train, progress=None, time_budget=None, max_workers=None):
+        deadline = time.time() + time_budget if time_budget else None
+        max_workers = max_workers or min(len(self.models), os.cpu_count() or 1)
+        # Split the cores between the families running at the same time
+        n_jobs = max(1, (os.cpu_count() or 1) // max_workers)
+
+        fitted = {}
+        # spawn, not fork: the caller may be a threaded web process
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(halving_search, config['model'], config['params'], X_train, y_train,
+                                   deadline, n_jobs=n_jobs)
+                       for config in self.models.values()]
+            names = dict(zip(futures, self.models))
+            for done, future in enumerate(as_completed(futures), start=1):
+                name = names[future]
+                model, fit_time, search_info = future.result()
+                if progress:
+                    progress(name, done, len(self.models))
+                if model is None:
+                    print(f"  {name}: no fit finished within the time budget")
+                    continue
+                print(f"  {name}: {search_info['best_params']} in {fit_time:.1f}s")
+                fitted[name] = (model, fit_time, search_info)
+
+        # Keep the family order stable for best_model.json and the dashboard
+        return {name: fitted[name] for name in self.models if name in fitted}
+
+    def compile_model(self, model):
+        """Flatten a fitted model into the arrays read by ml.predictor.CompiledModel.
+
+        Supports RandomForestRegressor, XGBRegressor (gbtree) and
+        LinearRegression; returns None for anything else.
+        """
+        if isinstance(model, LinearRegression):
+            # Keep the fitted dtype: float32 features give float32 coefficients
+            return {'kind': np.array('linear'),
+                    'coef': np.asarray(model.coef_),
+                    'intercept': np.asarray(model.intercept_)}
+
+        if isinstance(model, RandomForestRegressor):
+            trees = []
+            for est in model.estimators_:
+                t = est.tree_
+                trees.append((t.children_left, t.children_right, t.feature,
+                              t.threshold, t.value[:, 0, 0], np.zeros(t.node_count, dtype=bool)))
+            return self._pack_trees('forest', trees, np.float64, base_score=0.0)
+
+        if isinstance(model, XGBRegressor):
+            booster_json = json.loads(model.get_booster().save_raw('json'))
+            gbm = booster_json['learner']['gradient_booster']
+            if gbm['name'] != 'gbtree':
+                return None
+            tree_dumps = gbm['model']['trees']
+            try:
+                # Early-stopped models predict with the best iteration only
+                tree_dumps = tree_dumps[:model.best_iteration + 1]
+            except AttributeError:
+                pass
+            trees = []
+            for td in tree_dumps:
+                conditions = np.asarray(td['split_conditions'], dtype=np.float32)
+                trees.append((np.asarray(td['left_children']), np.asarray(td['right_children']),
+                              np.asarray(td['split_indices']),
+                              conditions, conditions, # leaves keep their value in split_conditions
+                              np.asarray(td['default_left'], dtype=bool)))
+            base_score = booster_json['learner']['learner_model_param']['base_score']
+            return self._pack_trees('xgboost', trees, np.float32, base_score=float(base_score.strip('[]')))
+
+        return None
+
+    def _pack_trees(self, kind, trees, dtype, base_score):
+        # One node table for all trees; leaves point at themselves so every
+        # row can take exactly max_depth steps
+        roots, feature, threshold, left, right, value, default_left = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for children_left, children_right, feat, thr, val, dleft in trees:
+            n = len(children_left)
+            idx = np.arange(n)
+            is_leaf = children_left < 0
+            roots.append(offset)
+            left.append(np.where(is_leaf, idx, children_left) + offset)
+            right.append(np.where(is_leaf, idx, children_right) + offset)
+            feature.append(np.where(is_leaf, 0, feat))
+            threshold.append(np.where(is_leaf, 0, thr))
+            value.append(np.where(is_leaf, val, 0))
+            default_left.append(dleft)
+
+            depth = np.zeros(n, dtype=np.int64) # children are always numbered after their parent
+            for node in range(n):
+                if not is_leaf[node]:
+                    depth[children_left[node]] = depth[children_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+            offset += n
+
+        return {'kind': np.array(kind),
+                'roots': np.asarray(roots, dtype=np.int32),
+                'feature': np.concatenate(feature).astype(np.int32),
+                'threshold': np.concatenate(threshold).astype(dtype),
+                'left': np.concatenate(left).astype(np.int32),
+                'right': np.concatenate(right).astype(np.int32),
+                'value': np.concatenate(value).astype(dtype),
+                'default_left': np.concatenate(default_left),
+                'max_depth': np.int64(max_depth),
+                'base_score': np.asarray(base_score, dtype=dtype)}
+
+    def export_compiled(self, model, X_check, rtol=1e-6, atol=1.0):
+        """Compile ``model`` and save it if it matches ``model.predict`` on ``X_check``.
+
+        Returns the parity report stored in best_model.json, or None when the
+        model is not supported or the compiled predictions disagree.
+        """
+        arrays = self.compile_model(model)
+        if arrays is None:
+            return None
+
+        # Same float32 input the predictor feeds to either runtime
+        X32 = X_check.to_numpy(dtype=np.float32)
+        expected = model.predict(pd.DataFrame(X32, columns=X_check.columns))
+        actual = CompiledModel(arrays).predict(X32)
+        max_abs_err = float(np.max(np.abs(expected - actual))) if len(X32) else 0.0
+        if not np.allclose(expected, actual, rtol=rtol, atol=atol):
+            print(f"Compiled model mismatch (max abs err {max_abs_err}), serving the pickle instead")
+            return None
+
+        for col, le in self.encoders.items():
+            arrays[f'classes_{col[3:]}'] = np.asarray(le.classes_).astype(str)
+
+        path = os.path.join(self.model_path, 'compiled_model.npz')
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
+        return {'rows': int(len(X32)), 'max_abs_err': max_abs_err,
+                'bit_exact': bool(np.array_equal(expected, actual))}
+
+    def _save_artifact(self, obj, filename):
+        # Write to a temp file and rename so readers never see a half-written pickle
+        path = os.path.join(self.model_path, filename)
+        joblib.dump(obj, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
 if __name__ == "__main__":
     # Enhanced dummy training data generation for testing
     np.random.seed(42)
@@ -154,7 +534,12 @@ if __name__ == "__main__":
     # Add very small noise for high accuracy demonstration
     df['nilai_pasar_real'] += np.random.normal(0, 5000, n_samples)
     
+    # python -m ml.trainer [grid|halving] [time budget in seconds]
+    import sys
+    search = sys.argv[1] if len(sys.argv) > 1 else 'grid'
+    time_budget = float(sys.argv[2]) if len(sys.argv) > 2 else None
+
     trainer = MLTrainer()
-    results = trainer.train_all(df=df)
+    results = trainer.train_all(df=df, search=search, time_budget=time_budget)
     print("\nTraining Results:")
     print(json.dumps(results, indent=2))
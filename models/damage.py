@@ -1,7 +1,11 @@
 from datetime import datetime
+from sqlalchemy import event
 from . import db
+from .vehicle import mark_inputs_changed
 
 class Damage(db.Model):
+    __table_args__ = (db.Index('ix_damage_vehicle_id_status', 'vehicle_id', 'status'),)
+
     id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
     tanggal = db.Column(db.Date, nullable=False, default=datetime.utcnow)
@@ -22,3 +26,10 @@ class Damage(db.Model):
             'biaya': self.biaya_perbaikan,
             'status': self.status
         }
+
+
+@event.listens_for(Damage, 'after_insert')
+@event.listens_for(Damage, 'after_update')
+@event.listens_for(Damage, 'after_delete')
+def _damage_changed(mapper, connection, target):
+    mark_inputs_changed(connection, target.vehicle_id)
@@ -0,0 +1,100 @@
+from collections import Counter
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import attributes
+
+from . import db
+from .vehicle import Vehicle
+
+LAYAK = 'Layak Lelang'
+
+
+class FleetSummary(db.Model):
+    """Vehicle counts per condition and auction recommendation, read by the dashboard.
+
+    Kept current in the transaction of every vehicle write: ORM inserts,
+    updates and deletes through the mapper events below, bulk statements
+    (import upserts, fleet analysis) by calling ``apply_changes`` themselves.
+    Rows whose count drops to zero are kept.
+    """
+    kondisi_saat_ini = db.Column(db.String(20), primary_key=True)
+    layak = db.Column(db.Boolean, primary_key=True) # rekomendasi_lelang == 'Layak Lelang'
+    jumlah = db.Column(db.Integer, nullable=False, default=0)
+
+
+def summary_keys(pairs):
+    """Counter of FleetSummary keys for (kondisi_saat_ini, rekomendasi_lelang) pairs."""
+    return Counter((kondisi, rekomendasi == LAYAK) for kondisi, rekomendasi in pairs)
+
+
+def counts_select(vehicle_filter=None):
+    layak = Vehicle.rekomendasi_lelang == LAYAK
+    q = select(Vehicle.kondisi_saat_ini, layak, func.count()).group_by(Vehicle.kondisi_saat_ini, layak)
+    return q.where(vehicle_filter) if vehicle_filter is not None else q
+
+
+def stored_counts(connection, vehicle_filter=None):
+    """Counter of FleetSummary keys over the stored vehicles matching ``vehicle_filter``."""
+    counts = Counter()
+    for kondisi, is_layak, n in connection.execute(counts_select(vehicle_filter)):
+        counts[(kondisi, bool(is_layak))] += n  # A NULL recommendation compares as NULL: not layak
+    return counts
+
+
+def apply_changes(connection, removed, added):
+    """Move the counts of vehicles whose key went from ``removed`` to ``added`` (Counters)."""
+    table = FleetSummary.__table__
+    for key in set(removed) | set(added):
+        delta = added[key] - removed[key]
+        if not delta:
+            continue
+        kondisi, layak = key
+        match = (table.c.kondisi_saat_ini == kondisi) & (table.c.layak == layak)
+        result = connection.execute(table.update().where(match).values(jumlah=table.c.jumlah + delta))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(kondisi_saat_ini=kondisi, layak=layak, jumlah=delta))
+
+
+def rebuild(connection):
+    """Recount the whole summary from the vehicle table."""
+    table = FleetSummary.__table__
+    connection.execute(table.delete())
+    counts = stored_counts(connection)
+    if counts:
+        connection.execute(table.insert(), [{'kondisi_saat_ini': kondisi, 'layak': layak, 'jumlah': n}
+                                            for (kondisi, layak), n in counts.items()])
+
+
+def dashboard_counts():
+    """(total, layak, count per condition) from the summary, without touching the vehicle table."""
+    total, layak, per_kondisi = 0, 0, Counter()
+    for row in db.session.execute(select(FleetSummary)).scalars():
+        total += row.jumlah
+        layak += row.jumlah if row.layak else 0
+        per_kondisi[row.kondisi_saat_ini] += row.jumlah
+    return total, layak, per_kondisi
+
+
+def _committed(target, name):
+    history = attributes.get_history(target, name)
+    values = history.deleted or history.unchanged
+    return values[0] if values else None
+
+
+@event.listens_for(Vehicle, 'after_insert')
+def _vehicle_inserted(mapper, connection, target):
+    apply_changes(connection, Counter(), summary_keys([(target.kondisi_saat_ini, target.rekomendasi_lelang)]))
+
+
+@event.listens_for(Vehicle, 'after_update')
+def _vehicle_updated(mapper, connection, target):
+    old = summary_keys([(_committed(target, 'kondisi_saat_ini'), _committed(target, 'rekomendasi_lelang'))])
+    new = summary_keys([(target.kondisi_saat_ini, target.rekomendasi_lelang)])
+    if old != new:
+        apply_changes(connection, old, new)
+
+
+@event.listens_for(Vehicle, 'after_delete')
+def _vehicle_deleted(mapper, connection, target):
+    old = summary_keys([(_committed(target, 'kondisi_saat_ini'), _committed(target, 'rekomendasi_lelang'))])
+    apply_changes(connection, old, Counter())
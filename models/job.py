@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+from . import db
+
+class Job(db.Model):
+    __table_args__ = (db.Index('ix_job_status_priority', 'status', 'priority'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False) # analyze, import, retrain
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed, cancelled
+    priority = db.Column(db.Integer, nullable=False, default=0) # Higher runs first
+    params = db.Column(db.Text, nullable=True) # JSON
+    result = db.Column(db.Text, nullable=True) # JSON
+    error = db.Column(db.Text, nullable=True)
+
+    progress = db.Column(db.Float, nullable=False, default=0.0) # 0-100
+    message = db.Column(db.String(200), nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+
+    created_by = db.Column(db.String(20), nullable=True)
+    worker = db.Column(db.String(100), nullable=True) # host:pid of the runner that claimed it
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def duration(self):
+        if not self.started_at:
+            return None
+        return ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'progress': self.progress,
+            'message': self.message,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration': self.duration
+        }
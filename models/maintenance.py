@@ -1,7 +1,11 @@
 from datetime import datetime
+from sqlalchemy import event
 from . import db
+from .vehicle import mark_inputs_changed
 
 class Maintenance(db.Model):
+    __table_args__ = (db.Index('ix_maintenance_vehicle_id_tanggal', 'vehicle_id', 'tanggal'),)
+
     id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
     damage_id = db.Column(db.Integer, db.ForeignKey('damage.id'), nullable=True) # Linked Damage
@@ -15,3 +19,10 @@ class Maintenance(db.Model):
 
     # Relationship to Damage
     # damage = db.relationship('Damage', backref='maintenances')
+
+
+@event.listens_for(Maintenance, 'after_insert')
+@event.listens_for(Maintenance, 'after_update')
+@event.listens_for(Maintenance, 'after_delete')
+def _maintenance_changed(mapper, connection, target):
+    mark_inputs_changed(connection, target.vehicle_id)
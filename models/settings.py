@@ -1,3 +1,7 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import event, select
 from . import db
 
 class Settings(db.Model):
@@ -7,5 +11,69 @@ class Settings(db.Model):
     min_umur_lelang = db.Column(db.Integer, default=7) # Min 7 tahun (PMK 165/2021)
     depreciation_life = db.Column(db.Integer, default=8) # Masa manfaat 8 tahun (Kelompok 2)
     wajib_lelang_kondisi = db.Column(db.String(50), default='Rusak Berat')
-    
+
     updated_at = db.Column(db.DateTime, nullable=True)
+    version = db.Column(db.Integer, nullable=True, default=1) # Bumped on every save, checked by SettingsCache
+
+
+@event.listens_for(Settings, 'before_insert')
+@event.listens_for(Settings, 'before_update')
+def _stamp_updated_at(mapper, connection, target):
+    # Rule changes make every earlier analysis stale
+    target.updated_at = datetime.now()
+    target.version = (target.version or 0) + 1
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Immutable copy of the Settings row, safe to share between threads."""
+    max_biaya_perawatan_pct: Optional[float]
+    min_umur_lelang: Optional[int]
+    depreciation_life: Optional[int]
+    wajib_lelang_kondisi: Optional[str]
+    updated_at: Optional[datetime]
+    version: Optional[int]
+
+
+class SettingsCache:
+    """Process-wide SettingsSnapshot, reloaded only when the row's version changes.
+
+    Each ``get`` reads just (id, version); the full row is loaded again only
+    after a save, whether it happened in this worker or another one.
+    """
+
+    FIELDS = ['max_biaya_perawatan_pct', 'min_umur_lelang', 'depreciation_life',
+              'wajib_lelang_kondisi', 'updated_at', 'version']
+
+    def __init__(self):
+        self._current = (None, None)  # (key, snapshot), replaced atomically
+
+    def get(self):
+        row = db.session.execute(select(Settings.id, Settings.version).limit(1)).first()
+        key = tuple(row) if row else None
+        cached_key, snapshot = self._current
+        if snapshot is not None and cached_key == key:
+            return snapshot
+
+        s = Settings.query.first()
+        if s:
+            snapshot = SettingsSnapshot(**{f: getattr(s, f) for f in self.FIELDS})
+        else:
+            # No row yet: use the column defaults
+            table = Settings.__table__
+            snapshot = SettingsSnapshot(**{
+                f: table.c[f].default.arg if table.c[f].default is not None else None
+                for f in self.FIELDS
+            })
+        self._current = (key, snapshot)
+        return snapshot
+
+    def invalidate(self):
+        self._current = (None, None)
+
+
+settings_cache = SettingsCache()
+
+
+def get_settings_snapshot():
+    return settings_cache.get()
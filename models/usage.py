@@ -1,7 +1,11 @@
 from datetime import datetime
+from sqlalchemy import func, select
 from . import db
+from .vehicle import Vehicle
 
 class UsageHistory(db.Model):
+    __table_args__ = (db.Index('ix_usage_history_vehicle_id_tanggal_mulai', 'vehicle_id', 'tanggal_mulai'),)
+
     id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
     tanggal_mulai = db.Column(db.Date, nullable=False)
@@ -15,3 +19,21 @@ class UsageHistory(db.Model):
     tujuan = db.Column(db.String(100), nullable=True)
     
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+def last_usage(vehicle_filter=None):
+    """Subquery with each vehicle's latest usage (by tanggal_mulai, then id), one row per vehicle_id.
+
+    Ranks the histories with ROW_NUMBER in one pass instead of loading and
+    sorting ``usage_history`` per vehicle; with ``vehicle_filter`` (a
+    condition on Vehicle) only the selected vehicles' histories are ranked.
+    Outer join it on vehicle_id: vehicles without usage have no row.
+    """
+    rank = func.row_number().over(partition_by=UsageHistory.vehicle_id,
+                                  order_by=(UsageHistory.tanggal_mulai.desc(), UsageHistory.id.desc()))
+    ranked = select(UsageHistory.vehicle_id, UsageHistory.tanggal_mulai, UsageHistory.driver_name,
+                    UsageHistory.pejabat_name, UsageHistory.jabatan, rank.label('rank'))
+    if vehicle_filter is not None:
+        ranked = ranked.where(UsageHistory.vehicle_id.in_(select(Vehicle.id).where(vehicle_filter)))
+    ranked = ranked.subquery()
+    return select(ranked).where(ranked.c.rank == 1).subquery('last_usage')
@@ -1,15 +1,19 @@
 from datetime import datetime
+from sqlalchemy import event
 from . import db
 
+# Columns that feed the analysis; changing any of them makes the vehicle stale
+ANALYSIS_INPUTS = ('tahun_perolehan', 'harga_perolehan', 'jarak_tempuh', 'jenis', 'merk', 'tipe')
+
 class Vehicle(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     plat_no = db.Column(db.String(20), unique=True, nullable=False)
     jenis = db.Column(db.String(50), nullable=False) # Mobil, Motor, Truk
-    merk = db.Column(db.String(50), nullable=False)
+    merk = db.Column(db.String(50), nullable=False, index=True)
     tipe = db.Column(db.String(50), nullable=False)
-    tahun_perolehan = db.Column(db.Integer, nullable=False)
+    tahun_perolehan = db.Column(db.Integer, nullable=False, index=True)
     harga_perolehan = db.Column(db.Float, nullable=False)
-    kondisi_saat_ini = db.Column(db.String(20), nullable=False) # Baik, Rusak Ringan, Rusak Berat
+    kondisi_saat_ini = db.Column(db.String(20), nullable=False, index=True) # Baik, Rusak Ringan, Rusak Berat
     
     # User Info
     pengguna_saat_ini = db.Column(db.String(100), nullable=True)
@@ -22,16 +26,21 @@ class Vehicle(db.Model):
     # Prediction Results
     prediksi_nilai_jual = db.Column(db.Float, nullable=True)
     limit_lelang = db.Column(db.Float, nullable=True)  # Limit harga lelang (50-80% dari estimasi)
-    rekomendasi_lelang = db.Column(db.String(20), nullable=True) # Layak / Tidak
+    rekomendasi_lelang = db.Column(db.String(20), nullable=True, index=True) # Layak / Tidak
     skor_kelayakan = db.Column(db.Float, nullable=True)
     alasan_rekomendasi = db.Column(db.Text, nullable=True)
     last_analyzed = db.Column(db.DateTime, nullable=True)
 
+    # Dirty tracking for incremental re-analysis
+    inputs_changed_at = db.Column(db.DateTime, nullable=True, default=datetime.now, index=True) # Last change to inputs, damages or maintenance
+    analysis_expires_on = db.Column(db.Date, nullable=True) # Age or 12-month cost window rolls over on this date
+
     maintenances = db.relationship('Maintenance', backref='vehicle', lazy=True, cascade="all, delete-orphan")
     damages = db.relationship('Damage', backref='vehicle', lazy=True, cascade="all, delete-orphan")
     usage_history = db.relationship('UsageHistory', backref='vehicle', lazy=True, cascade="all, delete-orphan")
 
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.now, onupdate=datetime.now, index=True) # Any write to the row; moves the export data version
 
     def to_dict(self):
         return {
@@ -46,3 +55,31 @@ class Vehicle(db.Model):
             'prediksi': self.prediksi_nilai_jual,
             'rekomendasi': self.rekomendasi_lelang
         }
+
+
+# Sort key of the vehicle lists by score, unanalysed vehicles last. The -1.0 is
+# inlined rather than bound so queries match the index on the expression
+skor_sort_key = db.func.coalesce(Vehicle.skor_kelayakan, db.literal_column('-1.0'))
+db.Index('ix_vehicle_skor_sort', skor_sort_key)
+db.Index('ix_vehicle_rekomendasi_skor_sort', Vehicle.rekomendasi_lelang, skor_sort_key)  # The auction list
+# Plates are stored as typed; the plate search compares them uppercased
+plat_search_key = db.func.upper(Vehicle.plat_no)
+db.Index('ix_vehicle_plat_upper', plat_search_key)
+
+
+def mark_inputs_changed(connection, vehicle_id):
+    """Flag a vehicle for re-analysis from inside a flush (damage/maintenance events)."""
+    table = Vehicle.__table__
+    connection.execute(table.update().where(table.c.id == vehicle_id).values(inputs_changed_at=datetime.now()))
+
+
+@event.listens_for(Vehicle, 'before_update')
+def _track_input_changes(mapper, connection, target):
+    state = db.inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ANALYSIS_INPUTS):
+        return
+    if state.attrs.last_analyzed.history.has_changes():
+        # Analysed in the same unit of work, so the result already reflects the new inputs
+        target.inputs_changed_at = target.last_analyzed
+    else:
+        target.inputs_changed_at = datetime.now()
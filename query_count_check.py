@@ -0,0 +1,141 @@
+"""Query count check for the analysis.
+
+Seeds a throw-away SQLite database with vehicles, maintenance and damages,
+and counts the SQL statements (``before_cursor_execute``) run by:
+
+* ``DecisionEngine.analyze_fleet`` over the whole fleet, at two fleet sizes,
+* ``DecisionEngine.analyze_vehicle`` for one vehicle.
+
+Exits with status 1 if the fleet analysis runs more than
+``MAX_FLEET_STATEMENTS``, runs more statements outside fleet_summary on the
+larger fleet than on the smaller one (a query per vehicle crept back in),
+or ``analyze_vehicle`` runs more than ``MAX_VEHICLE_STATEMENTS``, so it can
+guard against regressions:
+
+    python query_count_check.py
+    python query_count_check.py --vehicles 200 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+# Settings version, fleet SELECT, FleetSummary counts before the update, the
+# bulk UPDATE, and per (condition, recommendation) count it moves (3 x 2) an
+# UPDATE, plus an INSERT the first time the pair appears
+MAX_FLEET_STATEMENTS = 4 + 2 * 6
+# Settings version and the maintenance and damage aggregates
+MAX_VEHICLE_STATEMENTS = 3
+
+
+def seed(count, start=0):
+    """Insert ``count`` vehicles, with maintenance and damages on most of them."""
+    from sqlalchemy import insert
+
+    from models import db
+    from models.damage import Damage
+    from models.maintenance import Maintenance
+    from models.vehicle import Vehicle
+
+    rng = random.Random(start)
+    today = date.today()
+    vehicles = [{'plat_no': f'T {start + i} QC', 'jenis': 'Mobil', 'merk': rng.choice(['Toyota', 'Honda', 'Isuzu']),
+                 'tipe': '-', 'tahun_perolehan': rng.randint(2005, 2023),
+                 'harga_perolehan': rng.uniform(1e8, 5e8), 'kondisi_saat_ini': 'Baik',
+                 'jarak_tempuh': rng.randint(0, 200000)}
+                for i in range(count)]
+    ids = db.session.execute(insert(Vehicle).returning(Vehicle.id), vehicles).scalars().all()
+    db.session.execute(insert(Maintenance), [
+        {'vehicle_id': vid, 'jenis_perawatan': 'Service Berkala', 'biaya': rng.uniform(1e6, 3e7),
+         'tanggal': today - timedelta(days=rng.randint(0, 700))}
+        for vid in ids for _ in range(rng.randint(0, 3))])
+    db.session.execute(insert(Damage), [
+        {'vehicle_id': vid, 'deskripsi': '-', 'tingkat_kerusakan': rng.choice(['Ringan', 'Sedang', 'Berat']),
+         'biaya_perbaikan': rng.uniform(1e6, 5e7), 'status': rng.choice([None, 'Belum Diperbaiki', 'Selesai']),
+         'tanggal': today}
+        for vid in ids for _ in range(rng.randint(0, 2))])
+    db.session.commit()
+
+
+@contextmanager
+def counting(engine):
+    """Collect the statements run on ``engine`` inside the block."""
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehicles', type=int, nargs=2, default=[100, 2000], metavar=('SMALL', 'LARGE'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'count.db')}"
+        os.environ['JOB_WORKERS'] = '0'
+        os.environ['WARMUP'] = 'off'
+
+        from app import app
+        from models import db
+        from models.fleet_summary import rebuild
+        from models.settings import get_settings_snapshot
+        from models.vehicle import Vehicle
+        from services.decision_engine import DecisionEngine
+
+        failures = []
+        with app.app_context():
+            de = DecisionEngine()
+            get_settings_snapshot()  # Loaded once per process, as in a running server
+            fleet_counts = []
+            seeded = 0
+            for size in args.vehicles:
+                seed(size - seeded, seeded)
+                seeded = size
+                rebuild(db.session.connection())
+                db.session.commit()
+                with counting(db.engine) as statements:
+                    analyzed = len(de.analyze_fleet())
+                db.session.commit()
+                print(f"analyze_fleet, {analyzed} vehicles: {len(statements)} statements")
+                for statement in statements:
+                    print(f"    {' '.join(statement.split())[:100]}")
+                # The summary statements depend on which counts moved, not on the fleet size
+                fleet_counts.append(sum('fleet_summary' not in statement for statement in statements))
+                if len(statements) > MAX_FLEET_STATEMENTS:
+                    failures.append(f"analyze_fleet of {analyzed} vehicles ran {len(statements)} statements, "
+                                    f"more than {MAX_FLEET_STATEMENTS}")
+            if fleet_counts[-1] > fleet_counts[0]:
+                failures.append(f"analyze_fleet ran {fleet_counts[0]} statements outside fleet_summary for "
+                                f"{args.vehicles[0]} vehicles but {fleet_counts[-1]} for {args.vehicles[-1]}")
+
+            vehicle = db.session.get(Vehicle, 1)
+            with counting(db.engine) as statements:
+                de.analyze_vehicle(vehicle)
+            db.session.rollback()
+            print(f"analyze_vehicle: {len(statements)} statements")
+            for statement in statements:
+                print(f"    {' '.join(statement.split())[:100]}")
+            if len(statements) > MAX_VEHICLE_STATEMENTS:
+                failures.append(f"analyze_vehicle ran {len(statements)} statements, more than {MAX_VEHICLE_STATEMENTS}")
+
+    for f in failures:
+        print(f"FAIL: {f}")
+    if not failures:
+        print("OK: the analysis runs a fixed number of statements")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
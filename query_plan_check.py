@@ -0,0 +1,167 @@
+"""Query plan check for the hot queries.
+
+Creates a throw-away SQLite database, turns it into one from before the
+indexes (model indexes dropped, migration history cleared), runs
+``migrate()`` twice, then prints ``EXPLAIN QUERY PLAN`` for the queries
+behind the dashboard, the vehicle lists, per-vehicle history, analysis and
+the job queue.
+
+Exits with status 1 if the migration is not idempotent or a query reads a
+whole table without an index (a bare ``SCAN <table>`` step), so it can
+guard against regressions:
+
+    python query_plan_check.py
+    python query_plan_check.py --database-url sqlite:///copy-of-production.db
+
+With ``--database-url`` the plans are checked against that database as it
+is, after migrating it; nothing is dropped.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, datetime
+
+
+def hot_queries():
+    """(name, statement, tables it may scan in full) for each checked query."""
+    from sqlalchemy import func, select
+
+    from models.fleet_summary import FleetSummary, counts_select
+    from models.job import Job
+    from models.maintenance import Maintenance
+    from models.usage import UsageHistory, last_usage
+    from models.vehicle import Vehicle
+    from services.fleet_data import fleet_select
+    from services.vehicle_list import VehicleList, encode_cursor
+
+    today = date(2026, 1, 1)
+    damaged = Vehicle.kondisi_saat_ini.in_(['Rusak Ringan', 'Rusak Berat'])
+    layak = Vehicle.rekomendasi_lelang == 'Layak Lelang'
+    auction_usage = last_usage(layak)
+    return [
+        # A handful of rows, one per condition and recommendation
+        ('dashboard: counts', select(FleetSummary), ('fleet_summary',)),
+        ('dashboard: latest vehicles',
+         select(Vehicle).order_by(Vehicle.created_at.desc()).limit(5), ()),
+        ('damaged list and export', select(Vehicle).where(damaged), ()),
+        ('auction list', select(Vehicle).where(layak), ()),
+        # Keyset pages of the vehicle lists read only the page, however deep
+        ('vehicle list page by plate',
+         VehicleList({}).page_select(encode_cursor('B 1234 CD', 10)), ()),
+        ('vehicle list page by year, newest first',
+         VehicleList({'sort': '-tahun'}).page_select(encode_cursor(2015, 10)), ()),
+        ('vehicle list page by make',
+         VehicleList({'sort': 'merk'}).page_select(encode_cursor('Toyota', 10)), ()),
+        ('vehicle list plate search',
+         VehicleList({'plat': 'b 12'}).page_select(encode_cursor('B 1234 CD', 10)), ()),
+        ('auction list page by score',
+         VehicleList({'sort': '-skor'}, {'rekomendasi': ['Layak Lelang']}).page_select(encode_cursor(80.0, 10)), ()),
+        ('vehicle maintenances', select(Maintenance).where(Maintenance.vehicle_id == 1), ()),
+        ('vehicle usage, latest first',
+         select(UsageHistory).where(UsageHistory.vehicle_id == 1).order_by(UsageHistory.tanggal_mulai.desc()), ()),
+        ('last usage of an auction list page',
+         select(last_usage(Vehicle.id.in_([1, 2, 3]))), ()),
+        ('auction export with last usage',
+         select(Vehicle.plat_no, auction_usage.c.driver_name)
+         .outerjoin(auction_usage, auction_usage.c.vehicle_id == Vehicle.id).where(layak), ()),
+        ('analysis of selected vehicles', fleet_select(Vehicle.id.in_([1, 2, 3]), today), ()),
+        ('dashboard counts of an analysed chunk', counts_select(Vehicle.id.between(1, 5000)), ()),
+        # The whole-fleet analysis reads every vehicle by design
+        ('analysis of the whole fleet', fleet_select(None, today), ('vehicle',)),
+        ('vehicles changed by an import',
+         select(Vehicle.id).where(Vehicle.inputs_changed_at >= datetime(2026, 1, 1)), ()),
+        ('export data version', select(func.max(Vehicle.updated_at)), ()),
+        ('job queue',
+         select(Job.id).where(Job.status == 'queued').order_by(Job.priority.desc(), Job.id).limit(5), ()),
+        ('stalled jobs',
+         select(Job.id).where(Job.status == 'running', Job.heartbeat_at < datetime(2026, 1, 1)), ()),
+    ]
+
+
+def query_plan(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    return [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+
+def full_scans(plan, tables, allowed):
+    """Tables in ``tables`` that ``plan`` reads without an index, except ``allowed``."""
+    scans = []
+    for step in plan:
+        words = step.split()
+        # 'SCAN vehicle' reads the table; 'SCAN vehicle USING [COVERING] INDEX ...' walks an index
+        if words[0] == 'SCAN' and len(words) == 2 and words[1] in tables and words[1] not in allowed:
+            scans.append(words[1])
+    return scans
+
+
+def drop_indexes(engine):
+    """Make the database look like one created before the migrations."""
+    from sqlalchemy import text
+
+    from migrate_db import schema_version
+    from models import db
+
+    with engine.begin() as conn:
+        for table in db.metadata.tables.values():
+            for index in table.indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+        conn.execute(schema_version.delete())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmp, 'plan.db')}"
+        os.environ['JOB_WORKERS'] = '0'
+        os.environ['WARMUP'] = 'off'
+
+        from app import app
+        from migrate_db import applied_versions, migrate, MIGRATIONS
+        from models import db
+
+        failures = []
+        with app.app_context():
+            engine = db.engine
+            if engine.dialect.name != 'sqlite':
+                print("EXPLAIN QUERY PLAN is SQLite only")
+                return 1
+
+            if not args.database_url:
+                drop_indexes(engine)
+                migrate(engine)
+            migrate(engine)  # Second run must be a no-op
+
+            expected = {version for version, _, _ in MIGRATIONS}
+            if applied_versions(engine) != expected:
+                failures.append(f"applied migrations {sorted(applied_versions(engine))}, expected {sorted(expected)}")
+            # Read from sqlite_master: reflection leaves out indexes on expressions
+            with engine.connect() as conn:
+                existing = set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+            for table in db.metadata.sorted_tables:
+                missing = {ix.name for ix in table.indexes} - existing
+                if missing:
+                    failures.append(f"missing indexes on {table.name}: {', '.join(sorted(missing))}")
+
+            tables = set(db.metadata.tables)
+            with engine.connect() as conn:
+                for name, stmt, allowed in hot_queries():
+                    plan = query_plan(conn, stmt)
+                    print(f"{name}:")
+                    for step in plan:
+                        print(f"    {step}")
+                    for table in full_scans(plan, tables, allowed):
+                        failures.append(f"{name}: full scan of {table}")
+
+    for f in failures:
+        print(f"FAIL: {f}")
+    if not failures:
+        print("OK: every hot query uses an index")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
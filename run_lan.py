@@ -1,4 +1,4 @@
-from app import app, db
+from app import app, db, start_background_services
 import socket
 
 def get_ip():
@@ -17,6 +17,8 @@ if __name__ == '__main__':
     with app.app_context():
         db.create_all()
     
+    start_background_services()
+
     ip_address = get_ip()
     port = 5000
     
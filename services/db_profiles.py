@@ -0,0 +1,85 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('default', 'sqlite', 'server')
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new SQLite connection of the sqlite profile.
+
+    WAL lets readers keep reading the last committed data while a writer
+    (an /analyze or /import chunk) holds the write lock, instead of waiting
+    for it as in rollback-journal mode. synchronous=NORMAL only syncs at
+    checkpoints, which is safe in WAL mode (a power cut can lose the last
+    commits, never corrupt the file). busy_timeout makes a second writer wait
+    for the lock instead of failing with "database is locked".
+    """
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT']}",
+        f"PRAGMA cache_size=-{config['SQLITE_CACHE_MB'] * 1024}",  # Negative: KiB instead of pages
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_MB'] * 1024 * 1024}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def server_options(config, url):
+    """create_engine() options of the server profile."""
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,  # Replace connections the server closed while idle
+        'query_cache_size': config['DB_STATEMENT_CACHE_SIZE'],
+    }
+    if url.get_backend_name() == 'postgresql' and url.get_driver_name() == 'psycopg':
+        # psycopg 3 prepares a statement on the server after it ran this many times on a connection
+        options['connect_args'] = {'prepare_threshold': 5}
+    return options
+
+
+def resolve_profile(config):
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    profile = config.get('DB_PROFILE') or ('sqlite' if url.get_backend_name() == 'sqlite' else 'server')
+    if profile not in PROFILES:
+        raise ValueError(f"DB_PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}")
+    if profile == 'sqlite' and url.get_backend_name() != 'sqlite':
+        raise ValueError(f"DB_PROFILE=sqlite needs a sqlite:// DATABASE_URL, not {url.get_backend_name()}")
+    return profile, url
+
+
+def init_app(app, db):
+    """Apply the DB_PROFILE engine settings and initialise ``db`` (Flask-SQLAlchemy) with them.
+
+    Explicit SQLALCHEMY_ENGINE_OPTIONS in the config win over the profile.
+    The sqlite profile's pragmas are run on new connections of this app's
+    engines only, not on other engines in the process.
+    """
+    profile, url = resolve_profile(app.config)
+    app.config['DB_PROFILE'] = profile
+
+    options = {}
+    if profile == 'server':
+        options = server_options(app.config, url)
+    elif profile == 'sqlite':
+        options = {'query_cache_size': app.config['DB_STATEMENT_CACHE_SIZE']}
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+
+    if profile == 'sqlite':
+        pragmas = sqlite_pragmas(app.config)
+
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+        # Engines are created by db.init_app but connect only on first use
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine.dialect.name == 'sqlite':
+                    event.listen(engine, 'connect', set_sqlite_pragmas)
+    return profile
@@ -1,166 +1,275 @@
-from models.settings import Settings
-from ml.predictor import MLPredictor
+import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, case, func, or_, select, update
+
+from models import db
+from models.vehicle import Vehicle
+from models.fleet_summary import apply_changes, stored_counts, summary_keys
+from models.damage import Damage
+from models.maintenance import Maintenance
+from models.settings import get_settings_snapshot
+from ml.registry import get_predictor, registry
+from services import fleet_data
+
+# Columns written back to Vehicle after an analysis run
+RESULT_COLUMNS = ['kondisi_saat_ini', 'nilai_buku', 'prediksi_nilai_jual', 'limit_lelang',
+                  'rekomendasi_lelang', 'skor_kelayakan', 'alasan_rekomendasi', 'analysis_expires_on']
+
 
 class DecisionEngine:
     def __init__(self):
-        self.predictor = MLPredictor()
-        
-    def analyze_vehicle(self, vehicle):
-        # 1. Get ML Prediction (Reference only)
-        vehicle_dict = {
+        # Shared, already-loaded predictor; reloaded only when new artifacts are trained
+        self.predictor = get_predictor()
+
+    def analyze_vehicle(self, vehicle, settings=None):
+        settings = settings or get_settings_snapshot()
+
+        current_date = datetime.date.today()
+
+        # Inputs from the (possibly unsaved) object; annual repair cost and
+        # open damage counts come from set-based aggregates
+        fleet = pd.DataFrame([{
+            'id': vehicle.id,
             'tahun_perolehan': vehicle.tahun_perolehan,
             'harga_perolehan': vehicle.harga_perolehan,
-            'kondisi_saat_ini': vehicle.kondisi_saat_ini,
             'jarak_tempuh': vehicle.jarak_tempuh,
-            'jenis': vehicle.jenis
-        }
-        
-        # ML Prediction as reference (will be overridden by adjusted book value)
-        predicted_value = self.predictor.predict(vehicle_dict)
-        
+            'kondisi_saat_ini': vehicle.kondisi_saat_ini,
+            'jenis': vehicle.jenis,
+            'merk': vehicle.merk,
+            'tipe': vehicle.tipe
+        }])
+        fleet = self._attach_costs(fleet, self.cost_aggregates([vehicle.id], current_date))
+
+        # 1. ML Prediction as reference (will be overridden by adjusted book value)
+        predicted_value = self.predictor.predict_many(fleet)[0]
+
         # 2. Rule Based Evaluation (PMK Standard)
-        settings = Settings.query.first()
-        if not settings:
-            settings = Settings() # Defaults
-            
-        reasons = []
-        is_layak = False
-        score = 0
-        
-        import datetime
-        from dateutil.relativedelta import relativedelta # Need to make sure dateutil is available or use timedelta
-        
+        result = self.score_fleet(fleet, settings, current_date).iloc[0]
+
+        for col in RESULT_COLUMNS:
+            value = result[col]
+            setattr(vehicle, col, value.item() if isinstance(value, np.generic) else value)
+
+        # Set timestamp when analysis is done
+        vehicle.last_analyzed = datetime.datetime.now()
+
+        return vehicle
+
+    def analyze_fleet(self, vehicle_ids=None, only_stale=False, settings=None, id_range=None):
+        """Analyze many vehicles in one vectorized pass.
+
+        Loads the fleet as columns (no ORM objects), scores it with
+        ``score_fleet`` and writes the results back with a single bulk
+        UPDATE, moving the FleetSummary counts with it. The caller commits. With ``only_stale`` vehicles whose
+        analysis is still current (see ``stale_filter``) are skipped.
+        ``settings`` is a SettingsSnapshot; the cached one is used if omitted.
+        ``id_range`` limits the run to ids between (lo, hi), inclusive.
+        Returns the scored frame, which also carries the ML reference
+        prediction in ``prediksi_ml``.
+        """
+        settings = settings or get_settings_snapshot()
+
         current_date = datetime.date.today()
-        current_year = current_date.year
-        vehicle_age = current_year - vehicle.tahun_perolehan
+        conditions = []
+        if vehicle_ids is not None:
+            conditions.append(Vehicle.id.in_(vehicle_ids))
+        if id_range is not None:
+            conditions.append(Vehicle.id.between(*id_range))
+        if only_stale:
+            conditions.append(self.stale_filter(settings, current_date))
+
+        vehicle_filter = and_(*conditions) if conditions else None
+        fleet = self.load_fleet(vehicle_filter, current_date)
+        if fleet.empty:
+            return fleet
+
+        result = self.score_fleet(fleet, settings, current_date)
+
+        # ML Prediction as reference, one batched model call per chunk
+        result['prediksi_ml'] = self.predictor.predict_many(fleet)
+
+        analyzed_at = datetime.datetime.now()
+        columns = {col: result[col].tolist() for col in ['id'] + RESULT_COLUMNS}
+        mappings = [
+            dict(zip(columns, values), last_analyzed=analyzed_at)
+            for values in zip(*columns.values())
+        ]
+        # Same filter and transaction as load_fleet, so these are the loaded vehicles before the update
+        connection = db.session.connection()
+        before = stored_counts(connection, vehicle_filter)
+        db.session.execute(update(Vehicle), mappings)
+        apply_changes(connection, before, summary_keys(zip(result['kondisi_saat_ini'], result['rekomendasi_lelang'])))
+
+        return result
+
+    def stale_filter(self, settings, current_date=None):
+        """SQL condition matching vehicles whose stored analysis may be out of date.
+
+        A vehicle is stale when it was never analysed, its inputs, damages or
+        maintenance changed afterwards, the rule settings or the model were
+        updated afterwards, or its ``analysis_expires_on`` date has been reached.
+        """
+        current_date = current_date or datetime.date.today()
+        conditions = [
+            Vehicle.last_analyzed.is_(None),
+            Vehicle.analysis_expires_on.is_(None),
+            Vehicle.analysis_expires_on <= current_date,
+            Vehicle.inputs_changed_at > Vehicle.last_analyzed,
+        ]
+        if settings.updated_at:
+            conditions.append(Vehicle.last_analyzed < settings.updated_at)
+        model_updated_at = registry.artifact_updated_at()
+        if model_updated_at:
+            conditions.append(Vehicle.last_analyzed < model_updated_at)
+        return or_(*conditions)
+
+    def load_fleet(self, vehicle_filter=None, current_date=None):
+        """Return one row per vehicle with the inputs needed by ``score_fleet`` and ``predict_many``."""
+        return fleet_data.load_fleet(vehicle_filter, current_date)
+
+    def cost_aggregates(self, vehicle_ids=None, current_date=None):
+        """Per-vehicle cost inputs computed with two GROUP BY queries.
+
+        ``vehicle_ids`` is a list or a SELECT of ids (None for the whole fleet).
+        Returns a frame indexed by vehicle id with the last 12 months of
+        maintenance cost (and its oldest date), the cost of damages that are
+        not yet repaired, and open damage counts (per severity and in total).
+        Used for single vehicles; fleets come from ``services.fleet_data``.
+        """
+        current_date = current_date or datetime.date.today()
+        one_year_ago = current_date - datetime.timedelta(days=365)
+
+        maint_q = (select(Maintenance.vehicle_id,
+                          func.sum(Maintenance.biaya),
+                          func.min(Maintenance.tanggal))
+                   .where(Maintenance.tanggal >= one_year_ago)
+                   .group_by(Maintenance.vehicle_id))
+
+        # Only damages that are not yet repaired count towards cost and condition
+        def open_count(level):
+            return func.sum(case((Damage.tingkat_kerusakan == level, 1), else_=0))
+
+        damage_q = (select(Damage.vehicle_id,
+                           func.sum(Damage.biaya_perbaikan),
+                           open_count('Berat'), open_count('Sedang'), open_count('Ringan'), func.count())
+                    .where(or_(Damage.status.is_(None), Damage.status != 'Selesai'))
+                    .group_by(Damage.vehicle_id))
+
+        if vehicle_ids is not None:
+            maint_q = maint_q.where(Maintenance.vehicle_id.in_(vehicle_ids))
+            damage_q = damage_q.where(Damage.vehicle_id.in_(vehicle_ids))
+
+        maint = pd.DataFrame(db.session.execute(maint_q).all(),
+                             columns=['vehicle_id', 'annual_maint', 'oldest_maint']).set_index('vehicle_id')
+        damage = pd.DataFrame(db.session.execute(damage_q).all(),
+                              columns=['vehicle_id', 'active_damage_cost', 'berat_count', 'sedang_count',
+                                       'ringan_count', 'open_damage_count']).set_index('vehicle_id')
+        return maint.join(damage, how='outer')
+
+    def _attach_costs(self, fleet, costs):
+        costs = costs.reindex(fleet['id'])
+        fleet['oldest_maint'] = costs['oldest_maint'].to_numpy()
+        for col in ['annual_maint', 'active_damage_cost']:
+            fleet[col] = costs[col].fillna(0).to_numpy(dtype=float)
+        for col in ['berat_count', 'sedang_count', 'ringan_count', 'open_damage_count']:
+            fleet[col] = costs[col].fillna(0).to_numpy(dtype=np.int64)
+        return fleet
+
+    def score_fleet(self, fleet, settings, current_date=None):
+        """Apply the PMK rules to a fleet frame, one row per vehicle.
+
+        ``fleet`` needs the columns produced by ``load_fleet``. Returns a frame
+        with ``id`` and the ``RESULT_COLUMNS`` computed for every row.
+        """
+        current_date = current_date or datetime.date.today()
         min_age = settings.min_umur_lelang or 7
         econ_age = 10 # Batas usia ekonomis user request
-        
-        # Calculate Book Value (Straight Line with Residual Value)
         useful_life = settings.depreciation_life or 8
         residual_rate = 0.10  # 10% residual/salvage value for fully depreciated assets
-        
-        # Value = Cost * (1 - Age/Life), with minimum residual value
-        depreciation_factor = max(0, 1 - (vehicle_age / useful_life))
-        
-        if depreciation_factor <= 0:
-            # Fully depreciated - use residual value (10% of original cost)
-            book_value = vehicle.harga_perolehan * residual_rate
-        else:
-            # Standard depreciation
-            book_value = vehicle.harga_perolehan * depreciation_factor
-        
-        # Calculate Annual Repair Cost (Last 12 Months Maintenance + Active Damages)
-        one_year_ago = current_date - datetime.timedelta(days=365)
-        
-        annual_maint = 0
-        for m in vehicle.maintenances:
-            m_date = m.tanggal
-            if isinstance(m_date, datetime.datetime):
-                m_date = m_date.date()
-            if m_date >= one_year_ago:
-                annual_maint += m.biaya
-                
-        active_damage_cost = sum(d.biaya_perbaikan for d in vehicle.damages if d.status != 'Selesai')
-        total_annual_cost = annual_maint + active_damage_cost
-        
-        # Threshold 20% of Book Value
-        cost_threshold = 0.20 * book_value
-        is_uneconomical = total_annual_cost >= cost_threshold and total_annual_cost > 0
-
-        # Calculate Condition automatically based on damages
-        berat_count = sum(1 for d in vehicle.damages if d.tingkat_kerusakan == 'Berat' and d.status != 'Selesai')
-        sedang_count = sum(1 for d in vehicle.damages if d.tingkat_kerusakan == 'Sedang' and d.status != 'Selesai')
-        ringan_count = sum(1 for d in vehicle.damages if d.tingkat_kerusakan == 'Ringan' and d.status != 'Selesai')
-        
-        calculated_condition = 'Baik'
-        if berat_count >= 1:
-            calculated_condition = 'Rusak Berat'
-        elif sedang_count >= 1:  # Changed: even 1 Sedang makes it Rusak Ringan
-            calculated_condition = 'Rusak Ringan'
-        elif ringan_count >= 1:  # NEW: handle Ringan damage
-            calculated_condition = 'Rusak Ringan'
-        vehicle.kondisi_saat_ini = calculated_condition
-
-        # Apply Condition Adjustment to Book Value (PMK Standard)
-        if calculated_condition == 'Rusak Berat':
-            condition_factor = 0.50  # 50% dari nilai buku
-        elif calculated_condition == 'Rusak Ringan':
-            condition_factor = 0.75  # 75% dari nilai buku
-        else:  # Baik
-            condition_factor = 1.00  # 100% dari nilai buku
-        
+
+        vehicle_age = current_date.year - fleet['tahun_perolehan'].to_numpy(dtype=np.int64)
+        harga = fleet['harga_perolehan'].to_numpy(dtype=float)
+
+        # Book Value (Straight Line with Residual Value)
+        # Value = Cost * (1 - Age/Life), fully depreciated assets keep the residual value
+        depreciation_factor = np.maximum(0, 1 - (vehicle_age / useful_life))
+        book_value = np.where(depreciation_factor <= 0, harga * residual_rate, harga * depreciation_factor)
+
+        # Annual Repair Cost vs. 20% of Book Value
+        total_annual_cost = (fleet['annual_maint'].to_numpy(dtype=float)
+                             + fleet['active_damage_cost'].to_numpy(dtype=float))
+        is_uneconomical = (total_annual_cost >= 0.20 * book_value) & (total_annual_cost > 0)
+
+        # Condition derived from open damages
+        rusak_berat = fleet['berat_count'].to_numpy() >= 1
+        rusak_ringan = ~rusak_berat & ((fleet['sedang_count'].to_numpy() >= 1) | (fleet['ringan_count'].to_numpy() >= 1))
+        calculated_condition = np.select([rusak_berat, rusak_ringan], ['Rusak Berat', 'Rusak Ringan'], 'Baik')
+
+        # Condition Adjustment to Book Value (PMK Standard) and Auction Limit (80%)
+        condition_factor = np.select([rusak_berat, rusak_ringan], [0.50, 0.75], 1.00)
         adjusted_value = book_value * condition_factor
-        
-        # Store Book Value and Adjusted Value as prediction
-        vehicle.nilai_buku = book_value
-        vehicle.prediksi_nilai_jual = adjusted_value  # Use adjusted value as main prediction
-        
-        # Calculate Auction Limit (80% standar, range 50-80%)
-        # PMK: Limit lelang biasanya 50-80% dari nilai taksir
-        limit_lelang_standard = adjusted_value * 0.80  # 80% sebagai default
-        limit_lelang_minimum = adjusted_value * 0.50  # 50% sebagai batas bawah
-        
-        # Set the standard limit (80%)
-        vehicle.limit_lelang = limit_lelang_standard
-
-        # Logic Flow
-        # Rule 1: Age Check < 7
-        if vehicle_age < min_age:
-            # Underage (Normally Rejected, unless Critical Exception)
-            if calculated_condition == 'Rusak Berat':
-                # Special Case: Total Loss (Exception PMK)
-                is_layak = True 
-                score = 100
-                reasons.append(f"Layak Lelang (Pengecualian): Usia {vehicle_age} th (< {min_age}). Kondisi Rusak Berat.")
-            elif is_uneconomical:
-                 # Special Case: High Repair Cost
-                 is_layak = True
-                 score = 90
-                 val_str = "NOL" if book_value <= 0 else f"Rp {book_value:,.0f}"
-                 reasons.append(f"Layak Lelang (Pengecualian): Usia {vehicle_age} th. Biaya (Rp {total_annual_cost:,.0f}) > 20% Nilai Buku ({val_str}).")
-            else:
-                is_layak = False
-                score = 0
-                reasons.append(f"Belum memenuhi syarat usia (Umur: {vehicle_age} th, Min: {min_age} th).")
-        else:
-            # Age Eligible (>= 7)
-            reasons.append(f"Usia {vehicle_age} tahun.")
-            
-            # Priority 1: Age > 10
-            if vehicle_age > econ_age:
-                is_layak = True
-                score = 95
-                reasons.append("Telah melewati batas usia pakai ekonomis (>10 th).")
-            
-            # Priority 2: Uneconomical
-            if is_uneconomical:
-                is_layak = True
-                score = max(score, 90) # At least 90
-                val_str = "NOL" if book_value <= 0 else f"Rp {book_value:,.0f}"
-                reasons.append(f"Tidak ekonomis: Est. Biaya (Rp {total_annual_cost:,.0f}) > 20% Nilai Buku ({val_str}).")
-
-            # Priority 3: Condition
-            if calculated_condition == 'Rusak Berat':
-                is_layak = True
-                score = 100 # Override to max
-                reasons.append("Kondisi Rusak Berat.")
-            elif calculated_condition == 'Rusak Ringan':
-                if score < 90:
-                     is_layak = True
-                     score = max(score, 80)
-                     reasons.append("Kondisi Rusak Ringan.")
-            
-            # Fallback
-            if not is_layak:
-                 reasons.append("Kondisi Baik & Masih Ekonomis.")
-                 score = 20
-
-        vehicle.rekomendasi_lelang = 'Layak Lelang' if is_layak else 'Tidak Layak'
-        vehicle.skor_kelayakan = score
-        vehicle.alasan_rekomendasi = " ".join(reasons)
-        
-        # Set timestamp when analysis is done
-        vehicle.last_analyzed = datetime.datetime.now()
-        
-        return vehicle
+        limit_lelang = adjusted_value * 0.80
+
+        # The result stays valid until the vehicle ages a year or its oldest
+        # maintenance record drops out of the 12-month cost window
+        next_year = pd.Timestamp(current_date.year + 1, 1, 1)
+        oldest_maint = pd.to_datetime(fleet['oldest_maint'])
+        analysis_expires_on = (oldest_maint + pd.Timedelta(days=366)).clip(upper=next_year).fillna(next_year).dt.date
+
+        # Rule 1: Age Check
+        underage = vehicle_age < min_age
+        over_econ_age = vehicle_age > econ_age
+
+        is_layak = np.where(underage,
+                            rusak_berat | is_uneconomical,
+                            over_econ_age | is_uneconomical | rusak_berat | rusak_ringan)
+        score = np.where(underage,
+                         np.select([rusak_berat, is_uneconomical], [100, 90], 0),
+                         np.select([rusak_berat, over_econ_age, is_uneconomical, rusak_ringan], [100, 95, 90, 80], 20))
+
+        # Reason strings, built column-wise
+        index = fleet.index
+        age_str = pd.Series(vehicle_age, index=index).astype(str)
+        cost_str = np.full(len(fleet), '', dtype=object)
+        value_str = np.full(len(fleet), '', dtype=object)
+        cost_str[is_uneconomical] = [f"{x:,.0f}" for x in total_annual_cost[is_uneconomical]]
+        value_str[is_uneconomical] = ["NOL" if x <= 0 else f"Rp {x:,.0f}" for x in book_value[is_uneconomical]]
+        cost_str = pd.Series(cost_str, index=index)
+        value_str = pd.Series(value_str, index=index)
+
+        def part(mask, text):
+            return pd.Series(np.where(mask, text + " ", ""), index=index)
+
+        underage_reason = (
+            part(underage & rusak_berat,
+                 "Layak Lelang (Pengecualian): Usia " + age_str + f" th (< {min_age}). Kondisi Rusak Berat.")
+            + part(underage & ~rusak_berat & is_uneconomical,
+                   "Layak Lelang (Pengecualian): Usia " + age_str + " th. Biaya (Rp " + cost_str
+                   + ") > 20% Nilai Buku (" + value_str + ").")
+            + part(underage & ~rusak_berat & ~is_uneconomical,
+                   "Belum memenuhi syarat usia (Umur: " + age_str + f" th, Min: {min_age} th).")
+        )
+        adult = ~underage
+        adult_reason = (
+            part(adult, "Usia " + age_str + " tahun.")
+            + part(adult & over_econ_age, "Telah melewati batas usia pakai ekonomis (>10 th).")
+            + part(adult & is_uneconomical,
+                   "Tidak ekonomis: Est. Biaya (Rp " + cost_str + ") > 20% Nilai Buku (" + value_str + ").")
+            + part(adult & rusak_berat, "Kondisi Rusak Berat.")
+            + part(adult & rusak_ringan & ~over_econ_age & ~is_uneconomical, "Kondisi Rusak Ringan.")
+            + part(adult & ~is_layak, "Kondisi Baik & Masih Ekonomis.")
+        )
+
+        return pd.DataFrame({
+            'id': fleet['id'].to_numpy(),
+            'kondisi_saat_ini': calculated_condition,
+            'nilai_buku': book_value,
+            'prediksi_nilai_jual': adjusted_value,  # Adjusted book value is the main prediction
+            'limit_lelang': limit_lelang,
+            'rekomendasi_lelang': np.where(is_layak, 'Layak Lelang', 'Tidak Layak'),
+            'skor_kelayakan': score.astype(float),
+            'alasan_rekomendasi': (underage_reason + adult_reason).str.rstrip(),
+            'analysis_expires_on': analysis_expires_on.to_numpy()
+        }, index=index)
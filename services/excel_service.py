@@ -1,101 +1,524 @@
+import csv
+import io
+import os
+import tempfile
+import numpy as np
 import pandas as pd
+from datetime import date, datetime
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from sqlalchemy import func, insert, select, update
 from models import db
 from models.vehicle import Vehicle
-from io import BytesIO
+from models.fleet_summary import LAYAK, apply_changes, summary_keys
+from models.usage import last_usage
+
+# Sheet column -> value used for empty cells (and for 0 in the numeric columns)
+IMPORT_DEFAULTS = {
+    'Jenis': 'Mobil',
+    'Merk': 'Toyota',
+    'Tipe': '-',
+    'Tahun': 2020,
+    'Harga': 0,
+    'Kondisi': 'Baik',
+    'KM': 0
+}
+IMPORT_FIELDS = ['jenis', 'merk', 'tipe', 'tahun_perolehan', 'harga_perolehan', 'kondisi_saat_ini', 'jarak_tempuh']
+# Columns read from an import file and their types. CSV and Parquet are read
+# with this schema instead of inferring types per cell; other columns are
+# skipped. CSV numbers are read as text and checked per row by normalize_rows.
+IMPORT_SCHEMA = {
+    'Plat Nomor': 'string',
+    'Plat': 'string',
+    'Jenis': 'string',
+    'Merk': 'string',
+    'Tipe': 'string',
+    'Tahun': 'float64',
+    'Harga': 'float64',
+    'Kondisi': 'string',
+    'KM': 'float64'
+}
+IMPORT_FORMATS = ('.xlsx', '.xls', '.csv', '.parquet')
+UNSUPPORTED_IMPORT = "Format file tidak didukung. Gunakan file Excel (.xlsx atau .xls), CSV atau Parquet"
+
+# Export format -> mimetype
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# (header, column) of the export sheets
+ANALYSIS_EXPORT = [
+    ('Plat No', Vehicle.plat_no),
+    ('Jenis', Vehicle.jenis),
+    ('Merk/Tipe', (Vehicle.merk + ' ' + Vehicle.tipe)),
+    ('Tahun', Vehicle.tahun_perolehan),
+    ('Harga Awal', Vehicle.harga_perolehan),
+    ('Kondisi', Vehicle.kondisi_saat_ini),
+    ('Prediksi Nilai', Vehicle.prediksi_nilai_jual),
+    ('Rekomendasi', Vehicle.rekomendasi_lelang),
+    ('Skor', Vehicle.skor_kelayakan),
+    ('Alasan', Vehicle.alasan_rekomendasi),
+]
+DAMAGED_EXPORT = [
+    ('Plat Nomor', Vehicle.plat_no),
+    ('Jenis', Vehicle.jenis),
+    ('Merk', Vehicle.merk),
+    ('Tipe', Vehicle.tipe),
+    ('Tahun', Vehicle.tahun_perolehan),
+    ('Kondisi', Vehicle.kondisi_saat_ini),
+    ('Jarak Tempuh', Vehicle.jarak_tempuh),
+    ('Harga Perolehan', Vehicle.harga_perolehan),
+    ('Prediksi Nilai Jual', Vehicle.prediksi_nilai_jual),
+    ('Rekomendasi', Vehicle.rekomendasi_lelang),
+    ('Skor', Vehicle.skor_kelayakan),
+]
+# The driver and official of each vehicle's latest usage are appended by export_auction
+AUCTION_EXPORT = [
+    ('Plat No', Vehicle.plat_no),
+    ('Jenis', Vehicle.jenis),
+    ('Merk/Tipe', (Vehicle.merk + ' ' + Vehicle.tipe)),
+    ('Tahun', Vehicle.tahun_perolehan),
+    ('Kondisi', Vehicle.kondisi_saat_ini),
+    ('Rekomendasi', Vehicle.rekomendasi_lelang),
+    ('Alasan', Vehicle.alasan_rekomendasi),
+]
 
 class ExcelService:
-    def import_vehicles(self, file_storage):
+    BATCH_SIZE = 5000 # Rows per bulk INSERT/UPDATE
+    LOOKUP_SIZE = 10000 # Plates per prefetch query
+    EXPORT_CHUNK_SIZE = 5000 # Rows fetched and written at a time
+
+    def import_file(self, path, chunk_size=None, progress=None):
+        """Import an Excel, CSV or Parquet file from disk, committing every ``chunk_size`` rows.
+
+        Each chunk is validated, upserted and committed on its own, so a
+        chunk with invalid rows stops the import without undoing the chunks
+        before it. With ``chunk_size=None`` the file is one chunk: all rows
+        or nothing. ``progress(rows_read, total_rows)`` is called after each
+        commit; total_rows is None if the file does not record its size.
+        """
+        if not path.lower().endswith(IMPORT_FORMATS):
+            return False, UNSUPPORTED_IMPORT
+
+        total = self.row_count(path)
+        chunks = self.iter_file(path, chunk_size)
+        imported = inserted = updated = 0
+        while True:
+            try:
+                first_row, df = next(chunks, (None, None))
+                if df is None:
+                    break
+                # Expected columns: Plat, Jenis, Merk, Tipe, Tahun, Harga, Kondisi, KM
+                # Map columns loosely
+                rows, errors = self.normalize_rows(df, first_row)
+                if errors:
+                    # Nothing of this chunk is written unless every row is valid
+                    return False, self.format_errors(errors) + self._saved_note(imported, inserted, updated)
+
+                chunk_inserted, chunk_updated = self.upsert_vehicles(rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                return False, str(e) + self._saved_note(imported, inserted, updated)
+
+            imported += len(rows)
+            inserted += chunk_inserted
+            updated += chunk_updated
+            # Outside the try: a cancelled job must not be reported as a failed import
+            if progress:
+                progress(first_row - 2 + len(df), total)
+
+        return True, f"Berhasil import {imported} data ({inserted} baru, {updated} diperbarui)."
+
+    def _saved_note(self, imported, inserted, updated):
+        if not imported:
+            return ''
+        return f" {imported} data sebelumnya sudah tersimpan ({inserted} baru, {updated} diperbarui)."
+
+    def row_count(self, path):
+        """Data rows as recorded in the file (xlsx dimension, Parquet metadata), or None."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.parquet':
+            return self._pyarrow()[1].ParquetFile(path).metadata.num_rows
+        if ext != '.xlsx':
+            return None
+        wb = load_workbook(path, read_only=True)
+        try:
+            max_row = wb.worksheets[0].max_row
+            return max_row - 1 if max_row else None
+        finally:
+            wb.close()
+
+    def iter_file(self, path, chunk_size=None):
+        """Yield (row of the first record, DataFrame) chunks of an import file.
+
+        Rows are numbered as in a sheet, the header being row 1.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.csv':
+            return self.iter_csv(path, chunk_size)
+        if ext == '.parquet':
+            return self.iter_parquet(path, chunk_size)
+        return self.iter_sheet(path, chunk_size)
+
+    def iter_csv(self, path, chunk_size=None):
+        # All IMPORT_SCHEMA columns as text, others skipped; utf-8-sig also accepts files saved by Excel
+        options = dict(usecols=lambda c: c in IMPORT_SCHEMA, dtype=str, encoding='utf-8-sig')
+        if chunk_size is None:
+            yield 2, pd.read_csv(path, **options)
+            return
+        first_row = 2
+        for df in pd.read_csv(path, chunksize=chunk_size, **options):
+            yield first_row, df
+            first_row += len(df)
+
+    def iter_parquet(self, path, chunk_size=None):
+        pa, pq = self._pyarrow()
+        f = pq.ParquetFile(path)
+        schema = f.schema_arrow
+        columns = [name for name in schema.names if name in IMPORT_SCHEMA]
+        # Cast to the declared types; text in a numeric column is left for normalize_rows to report
+        target = {'string': pa.string(), 'float64': pa.float64()}
+        casts = {}
+        for name in columns:
+            field_type = schema.field(name).type
+            if IMPORT_SCHEMA[name] == 'string' and not pa.types.is_string(field_type):
+                casts[name] = target['string']
+            elif IMPORT_SCHEMA[name] == 'float64' and (pa.types.is_integer(field_type) or pa.types.is_floating(field_type)):
+                casts[name] = target['float64']
+
+        first_row = 2
+        for batch in f.iter_batches(batch_size=chunk_size or max(f.metadata.num_rows, 1), columns=columns):
+            table = pa.Table.from_batches([batch])
+            for name, to in casts.items():
+                i = table.schema.get_field_index(name)
+                table = table.set_column(i, name, table.column(i).cast(to))
+            df = table.to_pandas()
+            yield first_row, df
+            first_row += len(df)
+
+    def _pyarrow(self):
+        # Optional dependency, only needed for Parquet
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Format Parquet membutuhkan pyarrow: pip install pyarrow")
+        return pa, pq
+
+    def iter_sheet(self, path, chunk_size=None):
+        """Yield (sheet row of the first record, DataFrame) chunks of the first worksheet.
+
+        .xlsx is read with read-only openpyxl, which parses rows as they are
+        iterated, so only one chunk is in memory at a time. .xls has no
+        streaming reader: it is read whole and then split.
+        """
+        if not path.endswith('.xlsx'):
+            df = pd.read_excel(path)
+            step = chunk_size or max(len(df), 1)
+            for start in range(0, len(df), step):
+                yield start + 2, df.iloc[start:start + step]
+            return
+
+        wb = load_workbook(path, read_only=True, data_only=True)
         try:
-            # Validate file type
-            filename = file_storage.filename if hasattr(file_storage, 'filename') else ''
-            if not (filename.endswith('.xlsx') or filename.endswith('.xls')):
-                return False, "Format file tidak didukung. Gunakan file Excel (.xlsx atau .xls)"
-            
-            df = pd.read_excel(file_storage)
-            
-            # Expected columns: Plat, Jenis, Merk, Tipe, Tahun, Harga, Kondisi, KM
-            # Map columns loosely
-            
-            count = 0
-            for _, row in df.iterrows():
-                # Fill NaN values before processing
-                row = row.fillna({
-                    'Plat Nomor': '',
-                    'Plat': '',
-                    'Jenis': 'Mobil',
-                    'Merk': 'Toyota',
-                    'Tipe': '-',
-                    'Tahun': 2020,
-                    'Harga': 0,
-                    'Kondisi': 'Baik',
-                    'KM': 0
-                })
-                
-                plat = row.get('Plat Nomor') or row.get('Plat')
-                if not plat or plat == '': 
-                    continue
-                
-                # Check exist
-                veh = Vehicle.query.filter_by(plat_no=str(plat)).first()
-                if not veh:
-                    veh = Vehicle(plat_no=str(plat))
-                
-                # Set all fields with safe defaults
-                veh.jenis = str(row.get('Jenis', 'Mobil'))
-                veh.merk = str(row.get('Merk', 'Toyota'))
-                veh.tipe = str(row.get('Tipe', '-'))
-                
-                # Handle numeric fields
-                tahun_val = row.get('Tahun', 2020)
-                veh.tahun_perolehan = int(float(tahun_val)) if tahun_val else 2020
-                
-                harga_val = row.get('Harga', 0)
-                veh.harga_perolehan = float(harga_val) if harga_val else 0.0
-                
-                veh.kondisi_saat_ini = str(row.get('Kondisi', 'Baik'))
-                
-                km_val = row.get('KM', 0)
-                veh.jarak_tempuh = int(float(km_val)) if km_val else 0
-                
-                db.session.add(veh)
-                count += 1
-            
-            db.session.commit()
-            return True, f"Berhasil import {count} data."
-        except Exception as e:
-            return False, str(e)
-
-    def export_analysis(self):
-        vehicles = Vehicle.query.all()
-        data = []
-        for v in vehicles:
-            data.append({
-                'Plat No': v.plat_no,
-                'Jenis': v.jenis,
-                'Merk/Tipe': f"{v.merk} {v.tipe}",
-                'Tahun': v.tahun_perolehan,
-                'Harga Awal': v.harga_perolehan,
-                'Kondisi': v.kondisi_saat_ini,
-                'Prediksi Nilai': v.prediksi_nilai_jual,
-                'Rekomendasi': v.rekomendasi_lelang,
-                'Skor': v.skor_kelayakan,
-                'Alasan': v.alasan_rekomendasi
-            })
-            
-        return self._create_excel(data, 'Analisis')
-        
-    def export_auction_list(self, vehicles_data):
-        # vehicles_data is list of dicts prepared by controller
-        return self._create_excel(vehicles_data, 'Layak Lelang')
-        
-    def export_vehicle_history(self, timeline_data):
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(h) if h is not None else f'Unnamed: {i}' for i, h in enumerate(header)]
+            width = len(columns)
+            first_row, buf = 2, []
+            for row in rows:
+                # Rows of a sheet without size information can be ragged
+                buf.append(row[:width] if len(row) >= width else row + (None,) * (width - len(row)))
+                if len(buf) == chunk_size:
+                    yield first_row, pd.DataFrame.from_records(buf, columns=columns)
+                    first_row, buf = first_row + len(buf), []
+            if buf:
+                yield first_row, pd.DataFrame.from_records(buf, columns=columns)
+        finally:
+            wb.close()
+
+    def normalize_rows(self, df, first_row=2):
+        """Validate and convert a sheet to Vehicle columns, column by column.
+
+        ``first_row`` is the sheet row of ``df``'s first record (2 below the
+        header). Rows without a plate are skipped. Returns (rows, errors):
+        rows has ``plat_no``, IMPORT_FIELDS and the sheet ``row``; errors is
+        a list of (sheet row, message).
+        """
+        sheet_row = pd.Series(range(first_row, first_row + len(df)), index=df.index)
+
+        def column(name, default):
+            # Fill NaN values before processing
+            if name in df:
+                return df[name].astype(object).where(df[name].notna(), default)
+            return pd.Series(default, index=df.index, dtype=object)
+
+        plat = column('Plat Nomor', '')
+        plat = plat.where(plat.astype(bool), column('Plat', ''))
+        keep = plat.astype(bool) & plat.notna()
+
+        errors = []
+        out = pd.DataFrame({'row': sheet_row, 'plat_no': plat.astype(str)}, index=df.index)
+        out['jenis'] = column('Jenis', IMPORT_DEFAULTS['Jenis']).astype(str)
+        out['merk'] = column('Merk', IMPORT_DEFAULTS['Merk']).astype(str)
+        out['tipe'] = column('Tipe', IMPORT_DEFAULTS['Tipe']).astype(str)
+        out['kondisi_saat_ini'] = column('Kondisi', IMPORT_DEFAULTS['Kondisi']).astype(str)
+
+        for name, field, label, as_int in [('Tahun', 'tahun_perolehan', 'Tahun', True),
+                                           ('Harga', 'harga_perolehan', 'Harga', False),
+                                           ('KM', 'jarak_tempuh', 'KM', True)]:
+            raw = column(name, IMPORT_DEFAULTS[name])
+            values = pd.to_numeric(raw, errors='coerce')
+            invalid = values.isna() & keep
+            errors += [(r, f"{label} tidak valid ({v!r})") for r, v in zip(sheet_row[invalid], raw[invalid])]
+            values = values.where(values != 0, IMPORT_DEFAULTS[name]).fillna(IMPORT_DEFAULTS[name])
+            out[field] = values.astype('int64') if as_int else values.astype(float)
+
+        return out[keep], sorted(errors)
+
+    def format_errors(self, errors, limit=10):
+        lines = [f"Baris {row}: {message}" for row, message in errors[:limit]]
+        if len(errors) > limit:
+            lines.append(f"... dan {len(errors) - limit} kesalahan lain")
+        return f"Import dibatalkan, {len(errors)} baris tidak valid. " + "; ".join(lines)
+
+    def diff_rows(self, rows):
+        """Compare normalized rows with the stored vehicles of the same plates.
+
+        Existing vehicles are prefetched by plate in batches, so there is no
+        query per row. A plate that appears twice takes the values of its
+        last row. Returns (new, current, stored, differs): the rows of
+        unknown plates; for known plates the incoming IMPORT_FIELDS and the
+        stored vehicle (with ``id`` and ``rekomendasi_lelang``), both indexed
+        by plate; and a boolean frame of the fields that differ.
+        """
+        rows = rows.drop_duplicates('plat_no', keep='last')
+        plates = rows['plat_no'].tolist()
+
+        existing = []
+        columns = [Vehicle.id, Vehicle.plat_no, Vehicle.rekomendasi_lelang] + [getattr(Vehicle, f) for f in IMPORT_FIELDS]
+        for start in range(0, len(plates), self.LOOKUP_SIZE):
+            batch = plates[start:start + self.LOOKUP_SIZE]
+            existing += db.session.execute(select(*columns).where(Vehicle.plat_no.in_(batch))).all()
+        existing = pd.DataFrame(existing, columns=['id', 'plat_no', 'rekomendasi_lelang'] + IMPORT_FIELDS).set_index('plat_no')
+
+        is_new = ~rows['plat_no'].isin(existing.index)
+        current = rows[~is_new].set_index('plat_no')[IMPORT_FIELDS]
+        stored = existing.reindex(current.index)
+        differs = current.ne(stored[IMPORT_FIELDS]) & ~(current.isna() & stored[IMPORT_FIELDS].isna())
+        return rows[is_new], current, stored, differs
+
+    def upsert_vehicles(self, rows):
+        """Insert new plates and update existing ones with bulk statements.
+
+        Only new and changed rows are written (see ``diff_rows``). Bulk
+        statements skip the ORM events, so ``inputs_changed_at`` is stamped
+        and the FleetSummary counts are moved here. Every updated row is
+        stamped, not only those with changed ANALYSIS_INPUTS: the analysis
+        re-derives the condition an import may have changed, and the
+        recommendation depends on it. The caller commits.
+        Returns (inserted, updated).
+        """
+        new, current, stored, differs = self.diff_rows(rows)
+        inserts = new[['plat_no'] + IMPORT_FIELDS].to_dict('records')
+
+        changed = differs.any(axis=1)
+        now = datetime.now()
+        updates = current[changed].assign(id=stored.loc[changed, 'id'].astype('int64'))
+        updates = [dict(record, inputs_changed_at=now) for record in updates.to_dict('records')]
+
+        for start in range(0, len(inserts), self.BATCH_SIZE):
+            db.session.execute(insert(Vehicle), inserts[start:start + self.BATCH_SIZE])
+        for start in range(0, len(updates), self.BATCH_SIZE):
+            db.session.execute(update(Vehicle), updates[start:start + self.BATCH_SIZE])
+
+        # Imports never set a recommendation; only the condition can move a vehicle
+        recommendation = stored.loc[changed, 'rekomendasi_lelang']
+        apply_changes(
+            db.session.connection(),
+            summary_keys(zip(stored.loc[changed, 'kondisi_saat_ini'], recommendation)),
+            summary_keys(zip(current.loc[changed, 'kondisi_saat_ini'], recommendation))
+            + summary_keys((row['kondisi_saat_ini'], None) for row in inserts))
+        return len(inserts), len(updates)
+
+    def preview_file(self, path, chunk_size=None, progress=None, sample_size=50):
+        """Dry run of ``import_file``: classify the rows without writing anything.
+
+        Every plate is counted once, as new, changed or unchanged, by its
+        last row, which is the one the import writes; the earlier rows of
+        the plate count as duplicates. Invalid rows are collected for the
+        whole file instead of stopping at the first bad chunk. Returns a
+        JSON-serialisable summary with per-field change counts and up to
+        ``sample_size`` example rows of each kind.
+        """
+        if not path.lower().endswith(IMPORT_FORMATS):
+            raise ValueError(UNSUPPORTED_IMPORT)
+
+        summary = {'rows': 0, 'new': 0, 'changed': 0, 'unchanged': 0, 'duplicates': 0,
+                   'fields': dict.fromkeys(IMPORT_FIELDS, 0), 'error_count': 0, 'errors': [],
+                   'new_sample': [], 'changed_sample': []}
+        total = self.row_count(path)
+        # Plate -> (kind, bit mask of the changed IMPORT_FIELDS) of its latest row so far;
+        # a later row of the plate, in this chunk or a later one, replaces it
+        outcomes = {}
+        samples = {'new': {}, 'changed': {}}
+        bits = 1 << np.arange(len(IMPORT_FIELDS))
+        for first_row, df in self.iter_file(path, chunk_size):
+            rows, errors = self.normalize_rows(df, first_row)
+            summary['error_count'] += len(errors)
+            summary['errors'] += [f"Baris {row}: {message}" for row, message in errors[:sample_size - len(summary['errors'])]]
+            summary['rows'] += len(rows)
+
+            new, current, stored, differs = self.diff_rows(rows)
+            changed = differs.any(axis=1)
+            masks = differs.to_numpy() @ bits
+            replaced = set(rows['plat_no'])
+            for sample in samples.values():
+                for plate in sample.keys() & replaced:
+                    del sample[plate]
+            outcomes.update((plate, ('new', 0)) for plate in new['plat_no'])
+            outcomes.update((plate, ('changed' if mask else 'unchanged', int(mask)))
+                            for plate, mask in zip(current.index, masks))
+
+            room = sample_size - len(samples['new'])
+            for record in new[['row', 'plat_no'] + IMPORT_FIELDS].head(room).to_dict('records'):
+                samples['new'][record['plat_no']] = {k: self._plain(v) for k, v in record.items()}
+            for plate in changed[changed].index[:sample_size - len(samples['changed'])]:
+                fields = differs.columns[differs.loc[plate].to_numpy()]
+                samples['changed'][plate] = {
+                    'plat_no': plate,
+                    'changes': {f: [self._plain(stored.at[plate, f]), self._plain(current.at[plate, f])] for f in fields},
+                }
+            if progress:
+                progress(first_row - 2 + len(df), total)
+
+        summary['duplicates'] = summary['rows'] - len(outcomes)
+        for kind, _ in outcomes.values():
+            summary[kind] += 1
+        masks = np.fromiter((mask for _, mask in outcomes.values()), dtype=np.int64, count=len(outcomes))
+        for field, count in zip(IMPORT_FIELDS, ((masks[:, None] & bits) != 0).sum(axis=0)):
+            summary['fields'][field] = int(count)
+        summary['new_sample'] = list(samples['new'].values())
+        summary['changed_sample'] = list(samples['changed'].values())
+        return summary
+
+    def _plain(self, value):
+        # numpy scalar -> Python value, NaN -> None, so the summary is valid JSON
+        value = value.item() if hasattr(value, 'item') else value
+        return None if isinstance(value, float) and value != value else value
+
+    def export_analysis(self, fmt='xlsx'):
+        return self.export_query(ANALYSIS_EXPORT, 'Analisis', fmt)
+
+    def export_damaged(self, fmt='xlsx'):
+        return self.export_query(DAMAGED_EXPORT, 'Kendaraan Rusak', fmt,
+                                 Vehicle.kondisi_saat_ini.in_(['Rusak Ringan', 'Rusak Berat']))
+
+    def export_auction(self, fmt='xlsx'):
+        layak = Vehicle.rekomendasi_lelang == LAYAK
+        latest = last_usage(layak)
+        columns = AUCTION_EXPORT + [
+            ('Driver Terakhir', func.coalesce(latest.c.driver_name, '-')),
+            ('Pejabat Terakhir', func.coalesce(latest.c.pejabat_name, '-')),
+        ]
+        return self.export_query(columns, 'Layak Lelang', fmt, layak,
+                                 outerjoin=(latest, latest.c.vehicle_id == Vehicle.id))
+
+    def export_vehicle_history(self, timeline_data, fmt='xlsx'):
         # timeline_data is list of dicts
-        return self._create_excel(timeline_data, 'Riwayat Kendaraan')
-        
-    def _create_excel(self, data, sheet_name):
-        df = pd.DataFrame(data)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name=sheet_name)
+        return self._create_excel(timeline_data, 'Riwayat Kendaraan', fmt)
+
+    def export_query(self, columns, sheet_name, fmt='xlsx', where=None, outerjoin=None):
+        """Export (header, column expression) pairs of the vehicles matching ``where``.
+
+        Rows are fetched ``EXPORT_CHUNK_SIZE`` at a time with yield_per and
+        written straight to the file, so no list of all vehicles is built.
+        ``outerjoin`` is a (subquery, on clause) pair joined to the vehicles
+        for columns taken from it.
+        """
+        q = select(*[expr for _, expr in columns]).select_from(Vehicle).order_by(Vehicle.id)
+        if outerjoin is not None:
+            q = q.outerjoin(*outerjoin)
+        if where is not None:
+            q = q.where(where)
+        result = db.session.execute(q.execution_options(yield_per=self.EXPORT_CHUNK_SIZE))
+        types = [expr.type.python_type for _, expr in columns]
+        return self.write_export([header for header, _ in columns], result.partitions(), sheet_name, fmt, types)
+
+    def write_export(self, headers, chunks, sheet_name, fmt='xlsx', types=None):
+        """Write ``chunks`` (lists of row tuples) to an anonymous temp file in ``fmt``.
+
+        Memory stays at one chunk for every format: xlsx goes through a
+        write-only workbook, Parquet writes a row group per chunk. Returns the
+        file positioned at 0, for send_file to stream; it is deleted on close.
+        ``types`` (Python types per column) fixes the Parquet schema, which is
+        otherwise inferred from the first chunk.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Format export tidak didukung: {fmt}")
+        output = tempfile.TemporaryFile()
+        try:
+            getattr(self, f'_write_{fmt}')(output, headers, chunks, sheet_name, types)
+        except BaseException:
+            output.close()
+            raise
         output.seek(0)
         return output
+
+    def _write_xlsx(self, output, headers, chunks, sheet_name, types):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_name)
+        # Same header look as DataFrame.to_excel
+        side = Side(style='thin')
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = Font(bold=True)
+            cell.border = Border(left=side, right=side, top=side, bottom=side)
+            cell.alignment = Alignment(horizontal='center', vertical='top')
+            header_cells.append(cell)
+        ws.append(header_cells)
+        for rows in chunks:
+            for row in rows:
+                ws.append(tuple(row))
+        wb.save(output)
+
+    def _write_csv(self, output, headers, chunks, sheet_name, types):
+        # utf-8-sig so Excel opens the file with the right encoding
+        text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+        writer = csv.writer(text)
+        writer.writerow(headers)
+        for rows in chunks:
+            writer.writerows(rows)
+        text.flush()
+        text.detach()
+
+    def _write_parquet(self, output, headers, chunks, sheet_name, types):
+        pa, pq = self._pyarrow()
+        arrow_types = {int: pa.int64(), float: pa.float64(), str: pa.string(),
+                       datetime: pa.timestamp('us'), date: pa.date32()}
+        schema = pa.schema([(h, arrow_types[t]) for h, t in zip(headers, types)]) if types else None
+        writer = None
+        try:
+            for rows in chunks:
+                columns = list(zip(*rows)) if rows else [()] * len(headers)
+                table = pa.table(dict(zip(headers, columns)), schema=schema)
+                if writer is None:
+                    schema = table.schema
+                    writer = pq.ParquetWriter(output, schema)
+                writer.write_table(table)
+            if writer is None:
+                writer = pq.ParquetWriter(output, schema or pa.schema([(h, pa.string()) for h in headers]))
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _create_excel(self, data, sheet_name, fmt='xlsx'):
+        headers = list(data[0]) if data else []
+        rows = [tuple(d.get(h) for h in headers) for d in data]
+        return self.write_export(headers, [rows], sheet_name, fmt)
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, select
+
+from models import db
+from models.vehicle import Vehicle
+from models.usage import UsageHistory
+
+# Export name -> ExcelService method building it for a format
+EXPORTS = {
+    'analysis': 'export_analysis',
+    'damaged': 'export_damaged',
+    'auction': 'export_auction',
+}
+
+
+class ExportCache:
+    """Generated export files on disk, keyed by export, format and data version.
+
+    The data version is a hash of the vehicle count, highest id and latest
+    ``updated_at``, plus the usage count and highest id, read in one query.
+    Analysis results are written to the vehicle row, and damage and
+    maintenance changes stamp their vehicle (``mark_inputs_changed``), so
+    any change that can alter an export moves the version. Files are named
+    ``<export>-<version>.<format>`` and never rewritten; older versions are
+    removed when a new one is stored, and the least recently used files
+    (by access time) go once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, path='instance/export_cache', max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._build_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.path = app.config.get('EXPORT_CACHE_DIR', self.path)
+        self.max_bytes = app.config.get('EXPORT_CACHE_MAX_BYTES', self.max_bytes)
+
+    def data_version(self):
+        vehicles = select(func.count(), func.max(Vehicle.id), func.max(Vehicle.updated_at)).subquery()
+        usage = select(func.count(), func.max(UsageHistory.id)).subquery()
+        row = db.session.execute(select(vehicles, usage)).one()
+        return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:16]
+
+    def get(self, name, fmt, version=None):
+        """Path of the ``name`` export in ``fmt`` for the current data, building it if needed.
+
+        Returns (path, version); the version doubles as the ETag.
+        """
+        version = version or self.data_version()
+        path = os.path.join(self.path, f'{name}-{version}.{fmt}')
+        try:
+            # Mark as recently used for eviction; mtime stays the Last-Modified of the file
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+            return path, version
+        except FileNotFoundError:
+            pass
+
+        with self._build_lock:
+            # Another request may have built it while we waited
+            if not os.path.exists(path):
+                self._build(name, fmt, path)
+        return path, version
+
+    def pregenerate(self, formats=('xlsx',), progress=None):
+        """Build every export in ``formats`` for the current data; ``progress(done, total)`` after each."""
+        version = self.data_version()
+        jobs = [(name, fmt) for fmt in formats for name in EXPORTS]
+        for i, (name, fmt) in enumerate(jobs, 1):
+            self.get(name, fmt, version)
+            if progress:
+                progress(i, len(jobs))
+
+    def _build(self, name, fmt, path):
+        from services.excel_service import ExcelService
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with getattr(ExcelService(), EXPORTS[name])(fmt) as output, open(tmp, 'wb') as f:
+            shutil.copyfileobj(output, f)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+
+    def _evict(self, keep):
+        name = os.path.basename(keep)
+        prefix, fmt = name.split('-', 1)[0] + '-', os.path.splitext(name)[1]
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.path == keep or entry.name.endswith('.tmp'):
+                continue
+            if entry.name.startswith(prefix) and entry.name.endswith(fmt):
+                # Older version of the same export; it can never be served again
+                self._remove(entry.path)
+            else:
+                st = entry.stat()
+                files.append((st.st_atime, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files) + os.path.getsize(keep)
+        for _, size, file_path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(file_path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Removed by another worker
+
+
+export_cache = ExportCache()
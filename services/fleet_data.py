@@ -0,0 +1,112 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func, or_, select
+
+from models import db
+from models.vehicle import Vehicle
+from models.damage import Damage
+from models.maintenance import Maintenance
+
+# Column -> dtype of the frames built by iter_fleet; counts and costs are
+# COALESCEd in SQL, so only jarak_tempuh and oldest_maint can be missing
+FLEET_COLUMNS = {
+    'id': np.int64,
+    'tahun_perolehan': np.int64,
+    'harga_perolehan': np.float64,
+    'jarak_tempuh': np.float64,
+    'kondisi_saat_ini': 'category',
+    'jenis': 'category',
+    'merk': 'category',
+    'tipe': 'category',
+    'annual_maint': np.float64,        # Maintenance cost over the last 12 months
+    'oldest_maint': object,            # Oldest maintenance date in that window, or None
+    'active_damage_cost': np.float64,  # Repair cost of damages not yet fixed
+    'open_damage_count': np.int64,
+    'berat_count': np.int64,
+    'sedang_count': np.int64,
+    'ringan_count': np.int64,
+}
+
+
+def fleet_select(vehicle_filter=None, current_date=None):
+    """One SELECT returning a FLEET_COLUMNS row per vehicle.
+
+    Maintenance and open-damage aggregates are GROUP BY subqueries joined to
+    the vehicle table; with ``vehicle_filter`` they only aggregate the
+    selected vehicles.
+    """
+    current_date = current_date or datetime.date.today()
+    one_year_ago = current_date - datetime.timedelta(days=365)
+
+    maint_q = (select(Maintenance.vehicle_id,
+                      func.sum(Maintenance.biaya).label('annual_maint'),
+                      func.min(Maintenance.tanggal).label('oldest_maint'))
+               .where(Maintenance.tanggal >= one_year_ago)
+               .group_by(Maintenance.vehicle_id))
+
+    # Only damages that are not yet repaired count towards cost and condition
+    def open_count(level):
+        return func.sum(case((Damage.tingkat_kerusakan == level, 1), else_=0))
+
+    damage_q = (select(Damage.vehicle_id,
+                       func.sum(Damage.biaya_perbaikan).label('active_damage_cost'),
+                       func.count().label('open_damage_count'),
+                       open_count('Berat').label('berat_count'),
+                       open_count('Sedang').label('sedang_count'),
+                       open_count('Ringan').label('ringan_count'))
+                .where(or_(Damage.status.is_(None), Damage.status != 'Selesai'))
+                .group_by(Damage.vehicle_id))
+
+    if vehicle_filter is not None:
+        selected_ids = select(Vehicle.id).where(vehicle_filter)
+        maint_q = maint_q.where(Maintenance.vehicle_id.in_(selected_ids))
+        damage_q = damage_q.where(Damage.vehicle_id.in_(selected_ids))
+    maint = maint_q.subquery()
+    damage = damage_q.subquery()
+
+    q = (select(Vehicle.id, Vehicle.tahun_perolehan, Vehicle.harga_perolehan, Vehicle.jarak_tempuh,
+                Vehicle.kondisi_saat_ini, Vehicle.jenis, Vehicle.merk, Vehicle.tipe,
+                func.coalesce(maint.c.annual_maint, 0.0),
+                maint.c.oldest_maint,
+                func.coalesce(damage.c.active_damage_cost, 0.0),
+                func.coalesce(damage.c.open_damage_count, 0),
+                func.coalesce(damage.c.berat_count, 0),
+                func.coalesce(damage.c.sedang_count, 0),
+                func.coalesce(damage.c.ringan_count, 0))
+         .outerjoin(maint, maint.c.vehicle_id == Vehicle.id)
+         .outerjoin(damage, damage.c.vehicle_id == Vehicle.id)
+         .order_by(Vehicle.id))
+    if vehicle_filter is not None:
+        q = q.where(vehicle_filter)
+    return q
+
+
+def fleet_frame(rows):
+    """Build a typed FLEET_COLUMNS frame column by column from result rows."""
+    columns = list(zip(*rows)) if rows else [()] * len(FLEET_COLUMNS)
+    data = {}
+    for (name, dtype), values in zip(FLEET_COLUMNS.items(), columns):
+        if dtype == 'category':
+            data[name] = pd.Categorical(np.array(values, dtype=object))
+        else:
+            # None becomes NaN in float columns
+            data[name] = np.array(values, dtype=dtype)
+    return pd.DataFrame(data)
+
+
+def iter_fleet(vehicle_filter=None, current_date=None, chunk_size=None):
+    """Yield the fleet as typed frames of up to ``chunk_size`` rows (all at once if None)."""
+    q = fleet_select(vehicle_filter, current_date)
+    if chunk_size is None:
+        yield fleet_frame(db.session.execute(q).all())
+        return
+    result = db.session.execute(q.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield fleet_frame(rows)
+
+
+def load_fleet(vehicle_filter=None, current_date=None):
+    """The whole (filtered) fleet as one typed frame."""
+    return next(iter_fleet(vehicle_filter, current_date))
@@ -0,0 +1,184 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from models import db
+from models.job import Job
+
+# kind -> (function, default priority); filled by @task in services/tasks.py
+TASKS = {}
+
+
+def task(kind, priority=0):
+    def register(fn):
+        TASKS[kind] = (fn, priority)
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Handed to a task so it can report progress and notice cancellation."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def progress(self, pct, message=None):
+        """Record progress and raise JobCancelled if a cancel was requested.
+
+        Writes through its own connection, so call it between commits: on
+        SQLite an open write transaction in the task's session would block it.
+        """
+        with db.engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id == self.job_id)
+                         .values(progress=pct, message=message, heartbeat_at=datetime.now()))
+            cancel = conn.execute(select(Job.cancel_requested).where(Job.id == self.job_id)).scalar()
+        if cancel:
+            raise JobCancelled()
+
+
+class JobRunner:
+    """Runs queued jobs on background threads; the job table is the queue.
+
+    Every gunicorn worker runs its own threads. A job is claimed with a
+    conditional UPDATE, so exactly one runner executes it. Running jobs send
+    a heartbeat; jobs whose runner died are marked failed by the next claim.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Event()
+        self._running = set()
+        self._threads = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', 2.0)
+        self.heartbeat_timeout = app.config.get('JOB_HEARTBEAT_TIMEOUT', 120)
+
+    def start(self):
+        """Start JOB_WORKERS worker threads and the heartbeat, from a server process only."""
+        workers = self.app.config.get('JOB_WORKERS', 1)
+        for i in range(workers):
+            t = threading.Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        if workers:
+            t = threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def enqueue(self, kind, params=None, priority=None, created_by=None):
+        if kind not in TASKS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind=kind,
+                  params=json.dumps(params or {}),
+                  priority=TASKS[kind][1] if priority is None else priority,
+                  created_by=created_by,
+                  message='Menunggu antrian')
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def cancel(self, job):
+        """Cancel a queued job now, or ask a running one to stop at its next checkpoint."""
+        if job.status == 'queued':
+            job.status = 'cancelled'
+            job.finished_at = datetime.now()
+            job.message = 'Dibatalkan'
+        elif job.status == 'running':
+            job.cancel_requested = True
+        db.session.commit()
+        return job
+
+    def _worker_loop(self):
+        while True:
+            try:
+                job_id = self._claim_next()
+                if job_id is not None:
+                    self._run(job_id)
+                    continue
+            except Exception:
+                traceback.print_exc()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim_next(self):
+        with self.app.app_context():
+            now = datetime.now()
+            # Jobs whose runner stopped sending heartbeats will never finish
+            db.session.execute(
+                update(Job)
+                .where(Job.status == 'running', Job.heartbeat_at < now - timedelta(seconds=self.heartbeat_timeout))
+                .values(status='failed', error='Proses berhenti sebelum selesai', finished_at=now))
+            db.session.commit()
+
+            candidates = db.session.execute(
+                select(Job.id).where(Job.status == 'queued')
+                .order_by(Job.priority.desc(), Job.id).limit(5)).scalars().all()
+            for job_id in candidates:
+                claimed = db.session.execute(
+                    update(Job).where(Job.id == job_id, Job.status == 'queued')
+                    .values(status='running', started_at=now, heartbeat_at=now, worker=self.worker_name,
+                            message='Berjalan'))
+                db.session.commit()
+                if claimed.rowcount == 1:
+                    return job_id
+            return None
+
+    def _run(self, job_id):
+        self._running.add(job_id)
+        try:
+            with self.app.app_context():
+                job = db.session.get(Job, job_id)
+                fn = TASKS[job.kind][0]
+                params = json.loads(job.params or '{}')
+
+                try:
+                    result = fn(JobContext(job_id), **params)
+                    values = dict(status='done', progress=100.0, message='Selesai', result=json.dumps(result))
+                except JobCancelled:
+                    db.session.rollback()
+                    values = dict(status='cancelled', message='Dibatalkan')
+                except Exception as e:
+                    db.session.rollback()
+                    traceback.print_exc()
+                    values = dict(status='failed', message='Gagal', error=str(e))
+
+                db.session.execute(update(Job).where(Job.id == job_id)
+                                   .values(finished_at=datetime.now(), **values))
+                db.session.commit()
+        finally:
+            self._running.discard(job_id)
+
+    def _heartbeat_loop(self):
+        interval = max(1, self.heartbeat_timeout / 4)
+        while True:
+            time.sleep(interval)
+            running = list(self._running)
+            if not running:
+                continue
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(update(Job).where(Job.id.in_(running))
+                                     .values(heartbeat_at=datetime.now()))
+            except Exception:
+                # A long write transaction can hold the SQLite lock; try again next round
+                pass
+
+
+job_runner = JobRunner()
@@ -0,0 +1,137 @@
+import os
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db
+from models.vehicle import Vehicle
+from models.fleet_summary import rebuild
+from models.settings import get_settings_snapshot
+from models.job import Job
+from services.job_runner import job_runner, task
+
+# Task bodies import pandas and the ML stack themselves: this module is loaded
+# by every web process just to register the tasks
+
+
+@task('import', priority=20)
+def import_vehicles(ctx, path, filename, dry_run=False):
+    from services.decision_engine import DecisionEngine
+    from services.excel_service import ExcelService
+
+    ctx.progress(5, 'Membaca file')
+    svc = ExcelService()
+    chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE')
+
+    if dry_run:
+        # Nothing is written; the file stays for the import that confirms the preview
+        def checked(done, total):
+            ctx.progress(5 + 95.0 * done / total if total else 5, f'{done} baris diperiksa')
+
+        try:
+            summary = svc.preview_file(path, chunk_size, progress=checked)
+        except BaseException:
+            os.remove(path)
+            raise
+        return {'message': f"Pratinjau: {summary['new']} baru, {summary['changed']} berubah, "
+                           f"{summary['unchanged']} tidak berubah.",
+                'filename': filename, 'preview': summary}
+
+    def report(done, total):
+        # Import takes 5-60%, the analysis below the rest
+        pct = 5 + 55.0 * done / total if total else 5
+        ctx.progress(min(pct, 60), f'{done} baris dibaca')
+
+    started = datetime.now()
+    try:
+        success, msg = svc.import_file(path, chunk_size=chunk_size, progress=report)
+    finally:
+        os.remove(path)
+
+    # Analyse only the vehicles this import inserted or updated (upsert_vehicles
+    # stamps inputs_changed_at on both, a Kondisi-only change included); after
+    # a failed chunk this covers the chunks committed before it
+    ctx.progress(60, 'Analisis kendaraan')
+    de = DecisionEngine()
+    touched = select(Vehicle.id).where(Vehicle.inputs_changed_at >= started)
+    analyzed = len(de.analyze_fleet(vehicle_ids=touched))
+    db.session.commit()
+    if not success:
+        raise RuntimeError(msg)
+    return {'message': f"{msg} Analisis {analyzed} kendaraan berhasil diperbarui."}
+
+
+@task('analyze', priority=10)
+def analyze_fleet(ctx, full=False, chunk_size=5000):
+    from services.decision_engine import DecisionEngine
+
+    # Only vehicles whose inputs, rules or model changed, unless full
+    de = DecisionEngine()
+    settings = get_settings_snapshot()
+    total = Vehicle.query.count()
+    lo, hi = db.session.query(func.min(Vehicle.id), func.max(Vehicle.id)).one()
+
+    count = 0
+    if lo is not None:
+        # Commit per id range so progress and cancellation work on large fleets
+        for start in range(lo, hi + 1, chunk_size):
+            end = min(start + chunk_size - 1, hi)
+            count += len(de.analyze_fleet(only_stale=not full, settings=settings, id_range=(start, end)))
+            db.session.commit()
+            ctx.progress(100.0 * (end - lo + 1) / (hi - lo + 1), f'{count} kendaraan dianalisis')
+
+    if full:
+        # Each chunk moved the dashboard counts incrementally; a full run reads
+        # the whole fleet anyway, so it also recounts them from scratch
+        rebuild(db.session.connection())
+        db.session.commit()
+
+    # Rebuild the export files for the new results while nobody is waiting on them
+    if current_app.config.get('EXPORT_PREGENERATE') and \
+            not Job.query.filter_by(kind='exports', status='queued').first():
+        job_runner.enqueue('exports')
+
+    skipped = total - count
+    return {'analyzed': count, 'skipped': skipped,
+            'message': f'{count} kendaraan dianalisis ulang, {skipped} dilewati (tidak berubah).'}
+
+
+@task('exports', priority=5)
+def pregenerate_exports(ctx, formats=None):
+    from services.export_cache import export_cache
+
+    formats = formats or current_app.config.get('EXPORT_PREGENERATE', ['xlsx'])
+    export_cache.pregenerate(formats, progress=lambda i, n: ctx.progress(100.0 * i / n, f'{i}/{n} file export'))
+    return {'message': f'{len(formats)} format export disiapkan.'}
+
+
+@task('retrain', priority=0)
+def retrain(ctx, chunk_size=50000):
+    import pandas as pd
+    from ml.trainer import MLTrainer
+    from services.fleet_data import iter_fleet
+
+    # Fetch data from DB as typed columns, one projected query read in chunks
+    ctx.progress(2, 'Mengambil data kendaraan')
+    frames = list(iter_fleet(chunk_size=chunk_size))
+    # Read in chunks, an empty table yields no frame at all
+    if not frames or frames[0].empty:
+        return {'message': 'Tidak ada data untuk training'}
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    # Ideally we need historical sales data ("Real Value"), but for now we simulate target
+    # In real app, user would upload 'Sales History' separately
+    # Here we mock the target based on depreciation formula for demonstration
+    current_year = 2024
+    df['nilai_pasar_real'] = df['harga_perolehan'] * (0.85 ** (current_year - df['tahun_perolehan']))
+
+    trainer = MLTrainer()
+    results = trainer.train_all(
+        df=df, progress=lambda name, i, n: ctx.progress(10 + 85.0 * i / n, f'Melatih {name}'),
+        search=current_app.config.get('TRAIN_SEARCH', 'grid'),
+        time_budget=current_app.config.get('TRAIN_TIME_BUDGET'))
+    if results is None:
+        raise RuntimeError('Tidak ada model yang selesai dilatih dalam batas waktu')
+
+    return {'models': list(results), 'message': 'Training Selesai! Best Model updated.'}
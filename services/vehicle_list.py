@@ -0,0 +1,186 @@
+import base64
+import json
+
+from sqlalchemy import and_, false, func, or_, select, tuple_
+
+from models import db
+from models.fleet_summary import LAYAK, FleetSummary
+from models.vehicle import Vehicle, plat_search_key, skor_sort_key
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+COUNT_LIMIT = 1000  # Filters the summary cannot answer are counted up to this many rows
+
+KONDISI = ['Baik', 'Rusak Ringan', 'Rusak Berat']
+REKOMENDASI = [LAYAK, 'Tidak Layak']
+
+# ?sort= name -> sort expression; a leading '-' sorts descending. Every sort
+# is on (expression, id), so the keyset cursor is unambiguous
+SORTS = {
+    'plat': Vehicle.plat_no,
+    'merk': Vehicle.merk,
+    'tahun': Vehicle.tahun_perolehan,
+    'skor': skor_sort_key,
+    'id': Vehicle.id,
+}
+
+# (?sort= value, label) offered by the list pages
+SORT_OPTIONS = [
+    ('plat', 'Plat Nomor (A-Z)'),
+    ('-plat', 'Plat Nomor (Z-A)'),
+    ('merk', 'Merk'),
+    ('-tahun', 'Tahun terbaru'),
+    ('tahun', 'Tahun terlama'),
+    ('-skor', 'Skor tertinggi'),
+    ('-id', 'Terakhir ditambahkan'),
+]
+
+FILTERS = ('plat', 'merk', 'tipe', 'tahun_min', 'tahun_max', 'kondisi', 'rekomendasi')
+
+
+def prefix_range(column, prefix):
+    """``column`` starts with ``prefix`` as a range, so an index on it can be used (LIKE cannot in SQLite)."""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def encode_cursor(value, vehicle_id):
+    return base64.urlsafe_b64encode(json.dumps([value, vehicle_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(sort value, vehicle id) of an encode_cursor string; raises ValueError for anything else."""
+    try:
+        value, vehicle_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        vehicle_id = int(vehicle_id)
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError('Cursor tidak valid')
+    # Both are bound as query parameters: only scalars SQLite can store are accepted
+    if value is not None and not isinstance(value, (str, int, float)):
+        raise ValueError('Cursor tidak valid')
+    if any(isinstance(v, int) and not -2 ** 63 <= v < 2 ** 63 for v in (value, vehicle_id)):
+        raise ValueError('Cursor tidak valid')
+    return value, vehicle_id
+
+
+class VehicleList:
+    """A filtered, sorted vehicle list read one keyset page at a time.
+
+    Built from the request arguments (see FILTERS and SORTS); ``fixed`` holds
+    the filters a page always applies, e.g. the damaged list's conditions,
+    as lists of allowed values for 'kondisi' and 'rekomendasi'. Pages
+    continue after the (sort value, id) of the previous page's last row, so
+    a deep page costs the same as the first one.
+    """
+
+    def __init__(self, args, fixed=None, default_sort='plat'):
+        self.args = {name: args.get(name, '').strip() for name in FILTERS}
+        self.fixed = fixed or {}
+        sort = args.get('sort', default_sort)
+        self.sort = sort if sort.lstrip('-') in SORTS else default_sort
+
+    @property
+    def descending(self):
+        return self.sort.startswith('-')
+
+    @property
+    def sort_key(self):
+        return SORTS[self.sort.lstrip('-')]
+
+    def allowed(self, name, choices):
+        """Values of 'kondisi' or 'rekomendasi' the list is limited to, or None for all."""
+        values = set(self.fixed.get(name, choices))
+        if self.args[name]:
+            values &= {self.args[name]}
+        return None if values == set(choices) else values
+
+    def year(self, name):
+        try:
+            return int(self.args[name])
+        except ValueError:
+            return None
+
+    def conditions(self):
+        conditions = []
+        kondisi = self.allowed('kondisi', KONDISI)
+        if kondisi is not None:
+            conditions.append(Vehicle.kondisi_saat_ini.in_(sorted(kondisi)))
+        rekomendasi = self.allowed('rekomendasi', REKOMENDASI)
+        if rekomendasi == {LAYAK}:
+            conditions.append(Vehicle.rekomendasi_lelang == LAYAK)
+        elif rekomendasi:
+            # 'Tidak Layak' also covers vehicles that were never analysed, as the badge does
+            conditions.append(or_(Vehicle.rekomendasi_lelang.is_(None), Vehicle.rekomendasi_lelang != LAYAK))
+        elif rekomendasi is not None:
+            conditions.append(false())
+        if self.args['plat']:
+            conditions.append(prefix_range(plat_search_key, self.args['plat'].upper()))
+        if self.args['merk']:
+            conditions.append(Vehicle.merk.istartswith(self.args['merk'], autoescape=True))
+        if self.args['tipe']:
+            conditions.append(Vehicle.tipe.istartswith(self.args['tipe'], autoescape=True))
+        if self.year('tahun_min') is not None:
+            conditions.append(Vehicle.tahun_perolehan >= self.year('tahun_min'))
+        if self.year('tahun_max') is not None:
+            conditions.append(Vehicle.tahun_perolehan <= self.year('tahun_max'))
+        return conditions
+
+    def page_select(self, after=None, size=PAGE_SIZE):
+        """Select (vehicle, sort value) for ``size`` rows after the row ``after`` points to.
+
+        Raises ValueError for a malformed cursor.
+        """
+        key = self.sort_key
+        q = select(Vehicle, key).where(*self.conditions())
+        if after:
+            value, vehicle_id = decode_cursor(after)
+            position, cursor = tuple_(key, Vehicle.id), tuple_(value, vehicle_id)
+            # The redundant bound on the key alone lets SQLite seek an index on an expression
+            if self.descending:
+                q = q.where(key <= value, position < cursor)
+            else:
+                q = q.where(key >= value, position > cursor)
+        order = [key.desc(), Vehicle.id.desc()] if self.descending else [key, Vehicle.id]
+        return q.order_by(*order).limit(size)
+
+    def page(self, after=None, size=PAGE_SIZE):
+        """(vehicles, cursor of the next page or None) after the row ``after`` points to.
+
+        Raises ValueError for a malformed cursor.
+        """
+        size = max(1, min(size, MAX_PAGE_SIZE))
+        rows = db.session.execute(self.page_select(after, size + 1)).all()
+
+        vehicles = [vehicle for vehicle, _ in rows[:size]]
+        if len(rows) <= size:
+            return vehicles, None
+        last, value = rows[size - 1]
+        return vehicles, encode_cursor(value, last.id)
+
+    def count_estimate(self):
+        """(count, exact) of the vehicles in the list, without scanning the fleet.
+
+        Condition and recommendation filters alone are answered from
+        fleet_summary. Otherwise at most COUNT_LIMIT matching rows are
+        counted; a result of (COUNT_LIMIT, False) means "at least that many".
+        """
+        if not any(self.args[name] for name in FILTERS if name not in ('kondisi', 'rekomendasi')):
+            kondisi = self.allowed('kondisi', KONDISI)
+            rekomendasi = self.allowed('rekomendasi', REKOMENDASI)
+            q = select(func.coalesce(func.sum(FleetSummary.jumlah), 0))
+            if kondisi is not None:
+                q = q.where(FleetSummary.kondisi_saat_ini.in_(sorted(kondisi)))
+            if rekomendasi is not None:
+                q = q.where(FleetSummary.layak.in_([value == LAYAK for value in rekomendasi]))
+            return db.session.execute(q).scalar(), True
+
+        matching = select(Vehicle.id).where(*self.conditions()).limit(COUNT_LIMIT + 1).subquery()
+        count = db.session.execute(select(func.count()).select_from(matching)).scalar()
+        return min(count, COUNT_LIMIT), count <= COUNT_LIMIT
+
+    def query_args(self, **extra):
+        """The list's request arguments (without empty ones), for links and the next-page URL."""
+        args = {name: value for name, value in self.args.items() if value}
+        args['sort'] = self.sort
+        args.update(extra)
+        return args
@@ -0,0 +1,34 @@
+import threading
+import time
+import traceback
+
+
+def warm_up(app, trainer=False):
+    """Import the analysis stack and load the model before a request needs them.
+
+    Returns the seconds spent. ``trainer`` also imports scikit-learn and
+    xgboost for /retrain.
+    """
+    start = time.perf_counter()
+    with app.app_context():
+        from services.decision_engine import DecisionEngine
+        import services.excel_service  # noqa: F401
+        DecisionEngine()  # loads the predictor into ml.registry
+        if trainer:
+            import ml.trainer  # noqa: F401
+    return time.perf_counter() - start
+
+
+def start_warm_up(app):
+    """Run warm_up as configured by WARMUP: off, background or blocking."""
+    mode = app.config.get('WARMUP', 'off')
+    trainer = app.config.get('WARMUP_TRAINER', False)
+    if mode == 'blocking':
+        warm_up(app, trainer)
+    elif mode == 'background':
+        def run():
+            try:
+                warm_up(app, trainer)
+            except Exception:
+                traceback.print_exc()
+        threading.Thread(target=run, name='warm-up', daemon=True).start()
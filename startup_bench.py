@@ -0,0 +1,115 @@
+"""Startup benchmark for the web process.
+
+Imports ``app`` in fresh interpreters and reports:
+
+* the slowest modules from ``python -X importtime``,
+* time to import ``app`` and to serve the first /health_check and
+  /auth/login requests,
+* which heavy modules (pandas, scikit-learn, xgboost, ...) got loaded.
+
+Exits with status 1 if a heavy module is imported at startup or the import
+time goes over ``--max-import``, so it can guard against regressions:
+
+    python startup_bench.py
+    python startup_bench.py --runs 10 --max-import 1.5
+
+It runs against a throw-away SQLite database unless ``--database-url`` is given.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ['pandas', 'numpy', 'scipy', 'sklearn', 'xgboost', 'joblib', 'openpyxl']
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/health_check')
+first = time.perf_counter()
+client.get('/auth/login')
+login = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'first_request': first - start,
+    'login_request': login - start,
+    'heavy': [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def child_env(database_url):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = database_url
+    env['JOB_WORKERS'] = '0'  # no background threads in the measurement
+    env['WARMUP'] = 'off'
+    env['PYTHONWARNINGS'] = 'ignore'
+    return env
+
+
+def import_times(env, top=15):
+    """(module, cumulative seconds) for the slowest imports of ``app``."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                          env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(cumulative) / 1e6))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:top]
+
+
+def run_once(env):
+    proc = subprocess.run([sys.executable, '-c', CHILD % (HEAVY_MODULES,)],
+                          env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import', type=float, default=2.0, help='seconds, median of the runs')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = child_env(args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+
+        # First start creates the tables and demo users; not timed
+        run_once(env)
+
+        print("Slowest imports (cumulative):")
+        for name, seconds in import_times(env):
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"\nStartup over {args.runs} runs (median):")
+    for key in ['import', 'first_request', 'login_request']:
+        print(f"  {key:<14} {statistics.median(r[key] for r in runs) * 1000:8.1f} ms")
+
+    failures = []
+    heavy = sorted({m for r in runs for m in r['heavy']})
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    median_import = statistics.median(r['import'] for r in runs)
+    if median_import > args.max_import:
+        failures.append(f"import took {median_import:.2f}s, budget {args.max_import:.2f}s")
+
+    for f in failures:
+        print(f"FAIL: {f}")
+    if not failures:
+        print("OK: no heavy modules at startup")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
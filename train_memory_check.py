@@ -0,0 +1,100 @@
+"""Memory check for training from a sales history file.
+
+Writes synthetic sales history CSVs of two sizes, then trains on each with
+``MLTrainer.train_all(data_path=...)`` in a fresh interpreter and reports
+the peak RSS of that process. Both sizes are larger than ``--max-rows``,
+so the fitted sample is the same size and only the streamed parts (feature
+store build, sampling, test scoring) see more rows.
+
+Exits with status 1 if the larger file peaks more than ``--max-growth`` MB
+above the smaller one, so it can guard against regressions:
+
+    python train_memory_check.py
+    python train_memory_check.py --rows 200000 1000000 --max-rows 50000
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+COLUMNS = ['tahun_perolehan', 'harga_perolehan', 'jarak_tempuh', 'kondisi_saat_ini', 'jenis', 'merk', 'tipe',
+           'nilai_pasar_real']
+
+CHILD = r"""
+import json, resource, sys
+from ml.trainer import MLTrainer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBRegressor
+
+path, model_path, chunk_size, max_rows = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+trainer = MLTrainer(model_path)
+# One small grid point per family: the check is about memory, not the search
+trainer.models = {
+    'LinearRegression': {'model': LinearRegression(), 'params': {}},
+    'RandomForest': {'model': RandomForestRegressor(n_estimators=10, max_depth=8, random_state=42), 'params': {}},
+    'XGBoost': {'model': XGBRegressor(n_estimators=50, max_depth=4, random_state=42, n_jobs=1), 'params': {}},
+}
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+results = trainer.train_all(data_path=path, chunk_size=chunk_size, max_rows=max_rows)
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'before_mb': before / 1024, 'peak_mb': peak / 1024,
+                  'r2': {name: m['R2'] for name, m in results.items()}}))
+"""
+
+
+def write_history(path, n, seed=0):
+    import random
+    rng = random.Random(seed)
+    merk = ['Toyota', 'Honda', 'Mitsubishi', 'Suzuki', 'Yamaha']
+    kondisi = ['Baik', 'Rusak Ringan', 'Rusak Berat']
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(n):
+            tahun = rng.randint(2005, 2023)
+            harga = rng.uniform(1e8, 8e8)
+            writer.writerow([tahun, round(harga), rng.randint(0, 250000), kondisi[i % 3],
+                             'Mobil' if i % 3 else 'Motor', merk[i % 5], f'Tipe {i % 40}',
+                             round(harga * 0.85 ** (2024 - tahun))])
+
+
+def run_once(path, model_path, chunk_size, max_rows):
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    proc = subprocess.run([sys.executable, '-c', CHILD, path, model_path, str(chunk_size), str(max_rows)],
+                          env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs=2, default=[100000, 400000], metavar=('SMALL', 'LARGE'))
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--max-rows', type=int, default=20000)
+    parser.add_argument('--max-growth', type=float, default=20.0, help='MB of peak RSS')
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.rows:
+            path = os.path.join(tmp, f'history_{n}.csv')
+            write_history(path, n)
+            run = run_once(path, os.path.join(tmp, f'models_{n}'), args.chunk_size, args.max_rows)
+            print(f"{n} rows: peak RSS {run['peak_mb']:.1f} MB ({run['peak_mb'] - run['before_mb']:.1f} MB "
+                  f"above the imports), R2 {', '.join(f'{k} {v:.3f}' for k, v in run['r2'].items())}")
+            runs.append(run)
+
+    growth = runs[-1]['peak_mb'] - runs[0]['peak_mb']
+    if growth > args.max_growth:
+        print(f"FAIL: peak RSS grew {growth:.1f} MB from {args.rows[0]} to {args.rows[-1]} rows, "
+              f"more than {args.max_growth:.1f} MB")
+        return 1
+    print(f"OK: peak RSS grew {growth:.1f} MB from {args.rows[0]} to {args.rows[-1]} rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Request check for the paginated vehicle lists.
+
+Seeds a throw-away SQLite database with vehicles, logs in with the demo
+admin and requests /vehicles through the Flask test client:
+
+* following the ?after= cursors page by page must return every vehicle
+  exactly once, for several sorts,
+* malformed cursors, including ones whose sort value is a list or an
+  object, must get a 400 rather than reach the database,
+* the plate search must find plates stored in lower or mixed case,
+  whatever case is typed.
+
+Exits with status 1 if any of these fail, so it can guard against
+regressions:
+
+    python vehicle_list_check.py
+"""
+import base64
+import json
+import os
+import sys
+import tempfile
+
+VEHICLES = 120
+# Typed search -> the one plate it must find
+SEARCHES = {'d 1': 'd 1234 lc', 'D 56': 'D 5678 mX', 'd 5678 M': 'D 5678 mX'}
+
+
+def seed():
+    from sqlalchemy import insert
+
+    from models import db
+    from models.vehicle import Vehicle
+
+    db.session.execute(insert(Vehicle), [
+        {'plat_no': f'B {i:04d} VL', 'jenis': 'Mobil', 'merk': ['Toyota', 'Honda'][i % 2], 'tipe': '-',
+         'tahun_perolehan': 2005 + i % 19, 'harga_perolehan': 1e8, 'kondisi_saat_ini': 'Baik', 'jarak_tempuh': 0}
+        for i in range(VEHICLES)])
+    # Neither the import nor the forms change the case of a plate
+    db.session.execute(insert(Vehicle), [
+        {'plat_no': plat, 'jenis': 'Mobil', 'merk': 'Toyota', 'tipe': '-', 'tahun_perolehan': 2015,
+         'harga_perolehan': 1e8, 'kondisi_saat_ini': 'Baik', 'jarak_tempuh': 0}
+        for plat in set(SEARCHES.values())])
+    db.session.commit()
+
+
+def raw_cursor(payload):
+    """A cursor holding ``payload`` as encode_cursor would, whatever it is."""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'list.db')}"
+        os.environ['JOB_WORKERS'] = '0'
+        os.environ['WARMUP'] = 'off'
+
+        from app import app
+        from models.vehicle import Vehicle
+
+        failures = []
+        with app.app_context():
+            seed()
+            total = Vehicle.query.count()  # With the demo vehicles the app creates
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+
+        for sort in ('plat', '-tahun', 'merk'):
+            plates = []
+            url = f'/vehicles?format=json&size=25&sort={sort}'
+            while url:
+                page = client.get(url).get_json()
+                plates += [item['plat_no'] for item in page['items']]
+                url = page['next']
+            if len(plates) != total or len(set(plates)) != total:
+                failures.append(f"sort={sort}: paging returned {len(plates)} rows, {len(set(plates))} distinct")
+        print(f"paging: {total} vehicles in pages of 25")
+
+        malformed = {
+            'list value': raw_cursor([[1, 2], 3]),
+            'object value': raw_cursor([{'a': 1}, 3]),
+            'list id': raw_cursor(['B 0001 VL', [3]]),
+            'huge id': raw_cursor(['B 0001 VL', 10 ** 30]),
+            'huge value': raw_cursor([10 ** 30, 3]),
+            'one element': raw_cursor(['B 0001 VL']),
+            'not base64': '!!!',
+            'not json': base64.urlsafe_b64encode(b'not json').decode(),
+        }
+        for name, cursor in malformed.items():
+            status = client.get('/vehicles', query_string={'format': 'json', 'after': cursor}).status_code
+            print(f"cursor {name}: {status}")
+            if status != 400:
+                failures.append(f"cursor {name} got {status}, expected 400")
+
+        for typed, plat in SEARCHES.items():
+            found = [item['plat_no'] for item in
+                     client.get('/vehicles', query_string={'format': 'json', 'plat': typed}).get_json()['items']]
+            print(f"plate search {typed!r}: {found}")
+            if found != [plat]:
+                failures.append(f"plate search {typed!r} found {found}, expected [{plat!r}]")
+
+    for f in failures:
+        print(f"FAIL: {f}")
+    if not failures:
+        print("OK: the vehicle list pages, searches plates and rejects malformed cursors")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())